@@ -67,7 +67,7 @@ def importModules():
                     "guess", "animation", "files", "main", "finger",
                     "morphing", "tables", "proxy", "rigify", "merge", "hide",
                     "load_json", "mhx", "layers", "fkik", "hair",
-                    "transfer", "poser", "addon", "addons"]
+                    "transfer", "variants", "benchmark", "atlas", "bake", "depgraph", "poser", "addon", "addons"]
         anchor = os.path.basename(__file__[0:-12])
         theModules = []
         for modname in modnames:
@@ -119,12 +119,15 @@ class DAZ_PT_Setup(bpy.types.Panel):
             box.operator("daz.save_local_textures")
             box.operator("daz.resize_textures")
             box.operator("daz.change_resolution")
+            box.operator("daz.plan_resolution")
+            box.operator("daz.prewarm_images")
 
             box.separator()
             box.prop(scn, "DazNewColor")
             box.operator("daz.change_colors")
             box.operator("daz.change_skin_color")
             box.operator("daz.merge_materials")
+            box.operator("daz.benchmark_materials")
 
             box.separator()
             box.operator("daz.load_uv")
@@ -136,6 +139,7 @@ class DAZ_PT_Setup(bpy.types.Panel):
             box.separator()
             box.operator("daz.collapse_udims")
             box.operator("daz.restore_udims")
+            box.operator("daz.make_atlas")
 
             box.separator()
             box.label(text="Material Editor")
@@ -335,8 +339,14 @@ class DAZ_PT_Advanced(bpy.types.Panel):
             box.operator("daz.copy_bone_drivers")
             box.operator("daz.retarget_mesh_drivers")
             box.operator("daz.remove_unused_drivers")
+            box.operator("daz.remove_dead_drivers")
             box.operator("daz.remove_morph_drivers")
+            box.operator("daz.update_morph_drivers")
+            box.operator("daz.bake_drivers")
+            box.operator("daz.benchmark_drivers")
+            box.operator("daz.profile_drivers")
             box.operator("daz.convert_morphs_to_shapes")
+            box.operator("daz.generate_variants")
             box.separator()
             box.operator("daz.update_prop_limits")
             box.prop(scn, "DazPropMin")
@@ -432,6 +442,10 @@ class DAZ_PT_Settings(bpy.types.Panel):
             box.prop(scn, "DazPropMax")
             box.prop(scn, "DazUsePropLimits")
             box.prop(scn, "DazUsePropDefault")
+            box.prop(scn, "DazPruneMorphs")
+            if scn.DazPruneMorphs:
+                box.prop(scn, "DazMorphEpsilon")
+            box.prop(scn, "DazBakeConstantMorphs")
             box.separator()
             box.prop(scn, "DazZup")
             box.prop(scn, "DazOrientation")
@@ -465,6 +479,8 @@ class DAZ_PT_Settings(bpy.types.Panel):
             box.prop(scn, "DazUseEnvironment")
             box.prop(scn, "DazChooseColors")
             box.prop(scn, "DazMergeShells")
+            box.prop(scn, "DazReuseMaterials")
+            box.prop(scn, "DazDeferImages")
             box.prop(scn, "DazMaxBump")
             box.separator()
             box.prop(scn, "DazUseTextures")
@@ -1099,6 +1115,23 @@ def initialize():
         description = "Use the default values from DAZ files as default slider values.",
         default = True)
 
+    bpy.types.Scene.DazPruneMorphs = BoolProperty(
+        name = "Prune Morphs",
+        description = "Drop tiny morph deltas and skip shapekeys that become empty",
+        default = False)
+
+    bpy.types.Scene.DazMorphEpsilon = FloatProperty(
+        name = "Morph Epsilon",
+        description = "Deltas shorter than this (in Blender units) are dropped when pruning morphs",
+        min = 0.0, max = 0.01,
+        precision = 6,
+        default = 1e-5)
+
+    bpy.types.Scene.DazBakeConstantMorphs = BoolProperty(
+        name = "Bake Constant Morphs",
+        description = "Add morphs that are not driven or animated to the base mesh instead of making shapekeys",
+        default = False)
+
     bpy.types.Scene.DazShareThreshold = FloatProperty(
         name = "Sharing Threshold",
         description = "Maximum allowed distance for sharing meshes",
@@ -1275,6 +1308,11 @@ def register():
     proxy.initialize()
     rigify.initialize()
     transfer.initialize()
+    variants.initialize()
+    benchmark.initialize()
+    atlas.initialize()
+    bake.initialize()
+    depgraph.initialize()
     addon.initialize()
 
     initialize()
@@ -1314,6 +1352,11 @@ def unregister():
     proxy.uninitialize()
     rigify.uninitialize()
     transfer.uninitialize()
+    variants.uninitialize()
+    benchmark.uninitialize()
+    atlas.uninitialize()
+    bake.uninitialize()
+    depgraph.uninitialize()
     addon.uninitialize()
 
     for cls in classes:
@@ -0,0 +1,428 @@
+# Copyright (c) 2016-2019, Thomas Larsson
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+import re
+import bpy
+import os
+from .error import *
+from .utils import *
+if bpy.app.version < (2,80,0):
+    from .buttons27 import AtlasOptions
+else:
+    from .buttons28 import AtlasOptions
+
+#-------------------------------------------------------------
+#   Texture atlas.
+#   The uv islands of each material are packed into one atlas,
+#   and the source textures are composited into one image per
+#   channel with numpy. The mesh then gets a single material.
+#-------------------------------------------------------------
+
+AtlasChannels = [
+    ("Diffuse", "sRGB", (0.8,0.8,0.8,1),
+        [("BSDF_PRINCIPLED", "Base Color"), ("BSDF_DIFFUSE", "Color")]),
+    ("Roughness", "Non-Color", (0.5,0.5,0.5,1),
+        [("BSDF_PRINCIPLED", "Roughness"), ("BSDF_GLOSSY", "Roughness")]),
+    ("Normal", "Non-Color", (0.5,0.5,1,1),
+        [("NORMAL_MAP", "Color")]),
+]
+
+
+class AtlasMaterial:
+
+    def __init__(self, mat):
+        self.mat = mat
+        self.sources = {}
+        self.bbox = None
+        self.size = None
+        self.rect = None
+
+
+    def __repr__(self):
+        return ("<AtlasMaterial %s %s %s>" % (self.mat.name, self.bbox, self.rect))
+
+
+    def getSources(self):
+        for cname,colorSpace,default,sockets in AtlasChannels:
+            socket = findSocket(self.mat, sockets)
+            if socket is None:
+                self.sources[cname] = (None, default)
+            else:
+                img = findImage(socket)
+                if img is None and socket.is_linked:
+                    self.sources[cname] = (None, default)
+                    continue
+                color = getRgba(socket.default_value)
+                if cname == "Diffuse":
+                    color = linearToSrgb(color)
+                self.sources[cname] = (img, color)
+
+
+    def getSize(self):
+        umin,vmin,umax,vmax = self.bbox
+        w = h = 64
+        for cname,colorSpace,default,sockets in AtlasChannels:
+            img = self.sources[cname][0]
+            if img and img.size[0] > 0:
+                w,h = img.size
+                break
+        self.size = (max(1, (umax-umin)*w), max(1, (vmax-vmin)*h))
+
+
+def findSocket(mat, sockets):
+    if not mat.node_tree:
+        return None
+    for type,sname in sockets:
+        for node in mat.node_tree.nodes:
+            if node.type == type and sname in node.inputs.keys():
+                return node.inputs[sname]
+    return None
+
+
+def findImage(socket, depth=0):
+    if not socket.is_linked or depth > 4:
+        return None
+    node = socket.links[0].from_node
+    if node.type == 'TEX_IMAGE':
+        return node.image
+    for input in node.inputs:
+        img = findImage(input, depth+1)
+        if img:
+            return img
+    return None
+
+
+def getRgba(value):
+    if isinstance(value, float) or isinstance(value, int):
+        return (value, value, value, 1)
+    value = list(value)
+    if len(value) == 3:
+        value.append(1)
+    return tuple(value)
+
+
+def linearToSrgb(color):
+    srgb = []
+    for l in color[0:3]:
+        if l < 0.0031308:
+            s = 12.92*l
+        else:
+            s = 1.055*l**(1/2.4) - 0.055
+        srgb.append(s)
+    return tuple(srgb) + tuple(color[3:])
+
+
+def isTransparent(mat):
+    return (getattr(mat, "DazThinGlass", False) or
+            getattr(mat, "blend_method", 'OPAQUE') != 'OPAQUE')
+
+#-------------------------------------------------------------
+#   Packing. Rectangles are placed on shelves, and are scaled
+#   down until they all fit.
+#-------------------------------------------------------------
+
+def packRects(amats, size, margin):
+    area = sum([amat.size[0]*amat.size[1] for amat in amats])
+    scale = min(1.0, (size*size/area)**0.5)
+    while scale > 1e-3:
+        if placeRects(amats, size, margin, scale):
+            return
+        scale *= 0.9
+    raise DazError("Cannot pack %d materials in the atlas" % len(amats))
+
+
+def placeRects(amats, size, margin, scale):
+    x = y = shelf = 0
+    for amat in sorted(amats, key=lambda amat: -amat.size[1]):
+        w = max(1, int(amat.size[0]*scale)) + 2*margin
+        h = max(1, int(amat.size[1]*scale)) + 2*margin
+        if w > size:
+            return False
+        if x + w > size:
+            x = 0
+            y += shelf
+            shelf = 0
+        if y + h > size:
+            return False
+        amat.rect = (x+margin, y+margin, w-2*margin, h-2*margin)
+        x += w
+        shelf = max(shelf, h)
+    return True
+
+#-------------------------------------------------------------
+#   Compositing
+#-------------------------------------------------------------
+
+def getPixels(img, cache):
+    import numpy as np
+    if img.name in cache.keys():
+        return cache[img.name]
+    w,h = img.size
+    if w == 0 or h == 0:
+        pixels = None
+    else:
+        pixels = np.zeros(len(img.pixels), dtype=np.float32)
+        if hasattr(img.pixels, "foreach_get"):
+            img.pixels.foreach_get(pixels)
+        else:
+            pixels[:] = img.pixels[:]
+        nchannels = len(pixels)//(w*h)
+        pixels = pixels.reshape((h, w, nchannels))
+        if nchannels < 4:
+            rgba = np.ones((h, w, 4), dtype=np.float32)
+            rgba[:,:,0:nchannels] = pixels
+            pixels = rgba
+    cache[img.name] = pixels
+    return pixels
+
+
+def sampleRect(pixels, bbox, rect, margin):
+    # Bilinear samples of the uv bounding box, with margin.
+    # Uvs outside the image wrap around.
+    import numpy as np
+    h,w = pixels.shape[0:2]
+    umin,vmin,umax,vmax = bbox
+    x,y,rw,rh = rect
+    xs = (np.arange(-margin, rw+margin) + 0.5)/rw
+    ys = (np.arange(-margin, rh+margin) + 0.5)/rh
+    us = (umin + xs*(umax-umin))*w - 0.5
+    vs = (vmin + ys*(vmax-vmin))*h - 0.5
+    u0 = np.floor(us).astype(int)
+    v0 = np.floor(vs).astype(int)
+    fu = (us - u0)[None,:,None]
+    fv = (vs - v0)[:,None,None]
+    u1 = (u0 + 1) % w
+    v1 = (v0 + 1) % h
+    u0 = u0 % w
+    v0 = v0 % h
+    return ((1-fv)*((1-fu)*pixels[np.ix_(v0,u0)] + fu*pixels[np.ix_(v0,u1)]) +
+            fv*((1-fu)*pixels[np.ix_(v1,u0)] + fu*pixels[np.ix_(v1,u1)]))
+
+
+def compositeChannel(amats, cname, size, margin, cache):
+    import numpy as np
+    atlas = np.zeros((size, size, 4), dtype=np.float32)
+    for amat in amats:
+        x,y,rw,rh = amat.rect
+        img,color = amat.sources[cname]
+        pixels = (getPixels(img, cache) if img else None)
+        block = atlas[y-margin:y+rh+margin, x-margin:x+rw+margin]
+        if pixels is None:
+            block[:,:] = color
+        else:
+            block[:,:] = sampleRect(pixels, amat.bbox, amat.rect, margin)
+    return atlas
+
+
+def makeAtlasImage(ob, cname, colorSpace, atlas):
+    from .material import setImageColorSpace
+    size = atlas.shape[0]
+    img = bpy.data.images.new("%s %s" % (ob.name, cname), size, size, alpha=True)
+    setImageColorSpace(img, colorSpace)
+    if hasattr(img.pixels, "foreach_set"):
+        img.pixels.foreach_set(atlas.ravel())
+    else:
+        img.pixels = atlas.ravel()
+    if bpy.data.filepath:
+        folder = os.path.join(os.path.dirname(bpy.data.filepath), "textures")
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        img.filepath_raw = os.path.join(folder, "%s.png" % img.name)
+        img.file_format = 'PNG'
+        img.save()
+    elif bpy.app.version < (2,80,0):
+        img.pack(as_png=True)
+    else:
+        img.pack()
+    return img
+
+#-------------------------------------------------------------
+#   Atlas material
+#-------------------------------------------------------------
+
+def makeAtlasMaterial(ob, images):
+    mat = bpy.data.materials.new("%s Atlas" % ob.name)
+    mat.use_nodes = True
+    tree = mat.node_tree
+    tree.nodes.clear()
+    texco = tree.nodes.new("ShaderNodeUVMap")
+    texco.uv_map = "Atlas"
+    texco.location = (-800, 0)
+    bsdf = tree.nodes.new("ShaderNodeBsdfPrincipled")
+    output = tree.nodes.new("ShaderNodeOutputMaterial")
+    output.location = (300, 0)
+    tree.links.new(bsdf.outputs[0], output.inputs["Surface"])
+    for n,(cname,img) in enumerate(images.items()):
+        tex = tree.nodes.new("ShaderNodeTexImage")
+        tex.image = img
+        tex.location = (-500, 300 - 300*n)
+        tree.links.new(texco.outputs["UV"], tex.inputs["Vector"])
+        if cname == "Diffuse":
+            tree.links.new(tex.outputs["Color"], bsdf.inputs["Base Color"])
+        elif cname == "Roughness":
+            tree.links.new(tex.outputs["Color"], bsdf.inputs["Roughness"])
+        elif cname == "Normal":
+            nmap = tree.nodes.new("ShaderNodeNormalMap")
+            nmap.uv_map = "Atlas"
+            nmap.location = (-200, 300 - 300*n)
+            tree.links.new(tex.outputs["Color"], nmap.inputs["Color"])
+            tree.links.new(nmap.outputs["Normal"], bsdf.inputs["Normal"])
+    return mat
+
+
+def makeAtlas(ob, size, margin, keepTransparent):
+    import time
+    from .geometry import collapseUDims, makeNewUvloop
+    t1 = time.clock()
+    me = ob.data
+    if me.uv_layers.active is None:
+        raise DazError("%s has no UV map" % ob.name)
+    collapseUDims(ob)
+    srcname = me.uv_layers.active.name
+
+    amats = {}
+    kept = []
+    for mn,mat in enumerate(me.materials):
+        if mat is None:
+            continue
+        elif keepTransparent and isTransparent(mat):
+            kept.append(mn)
+        else:
+            amats[mn] = AtlasMaterial(mat)
+
+    uvlayer = me.uv_layers[srcname]
+    for f in me.polygons:
+        amat = amats.get(f.material_index)
+        if amat is None:
+            continue
+        for vn in f.loop_indices:
+            u,v = uvlayer.data[vn].uv
+            if amat.bbox is None:
+                amat.bbox = [u,v,u,v]
+            else:
+                bbox = amat.bbox
+                bbox[0] = min(bbox[0], u)
+                bbox[1] = min(bbox[1], v)
+                bbox[2] = max(bbox[2], u)
+                bbox[3] = max(bbox[3], v)
+    for mn,amat in list(amats.items()):
+        if amat.bbox is None:
+            del amats[mn]
+        elif amat.bbox[2] <= amat.bbox[0] or amat.bbox[3] <= amat.bbox[1]:
+            del amats[mn]
+            kept.append(mn)
+        else:
+            amat.getSources()
+            amat.getSize()
+    if not amats:
+        raise DazError("%s has no materials to put in an atlas" % ob.name)
+    kept.sort()
+    packRects(list(amats.values()), size, margin)
+
+    cache = {}
+    images = {}
+    for cname,colorSpace,default,sockets in AtlasChannels:
+        atlas = compositeChannel(amats.values(), cname, size, margin, cache)
+        images[cname] = makeAtlasImage(ob, cname, colorSpace, atlas)
+    cache = None
+
+    makeNewUvloop(me, "Atlas", True)
+    uvlayer = me.uv_layers[srcname]
+    atlasuvs = me.uv_layers["Atlas"]
+    for f in me.polygons:
+        amat = amats.get(f.material_index)
+        for vn in f.loop_indices:
+            u,v = uvlayer.data[vn].uv
+            if amat:
+                umin,vmin,umax,vmax = amat.bbox
+                x,y,rw,rh = amat.rect
+                u = (x + (u-umin)/(umax-umin)*rw)/size
+                v = (y + (v-vmin)/(vmax-vmin)*rh)/size
+            atlasuvs.data[vn].uv = (u,v)
+
+    remap = dict([(mn, 0) for mn in amats.keys()])
+    mats = [makeAtlasMaterial(ob, images)]
+    for mn in kept:
+        remap[mn] = len(mats)
+        mats.append(me.materials[mn])
+    findices = [remap.get(f.material_index, 0) for f in me.polygons]
+    while len(me.materials) > 0:
+        me.materials.pop()
+    for mat in mats:
+        me.materials.append(mat)
+    for f,mn in zip(me.polygons, findices):
+        f.material_index = mn
+    t2 = time.clock()
+    print("%s: %d materials in a %dx%d atlas, %d kept, %.1f s" %
+          (ob.name, len(amats), size, size, len(kept), t2-t1))
+
+
+class DAZ_OT_MakeAtlas(bpy.types.Operator, AtlasOptions):
+    bl_idname = "daz.make_atlas"
+    bl_label = "Make Atlas"
+    bl_description = "Pack the textures of selected meshes into one atlas per channel, and replace the materials with a single material"
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'MESH')
+
+    def draw(self, context):
+        self.layout.prop(self, "atlasSize")
+        self.layout.prop(self, "margin")
+        self.layout.prop(self, "keepTransparent")
+
+    def execute(self, context):
+        try:
+            bpy.ops.object.mode_set(mode='OBJECT')
+            for ob in getSceneObjects(context):
+                if ob.type == 'MESH' and getSelected(ob):
+                    makeAtlas(ob, self.atlasSize, self.margin, self.keepTransparent)
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_props_dialog(self)
+        return {'RUNNING_MODAL'}
+
+#----------------------------------------------------------
+#   Initialize
+#----------------------------------------------------------
+
+classes = [
+    DAZ_OT_MakeAtlas,
+]
+
+def initialize():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+
+def uninitialize():
+    for cls in classes:
+        bpy.utils.unregister_class(cls)
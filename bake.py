@@ -0,0 +1,195 @@
+# Copyright (c) 2016-2019, Thomas Larsson
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+import bpy
+from .error import *
+from .utils import *
+if bpy.app.version < (2,80,0):
+    from .buttons27 import BakeOptions
+else:
+    from .buttons28 import BakeOptions
+
+#-------------------------------------------------------------
+#   Bake drivers to F-curves.
+#   All driven channels of a rig, its meshes and their shapekeys
+#   are sampled in one pass over the frame range. Channels that
+#   change are written as F-curves, constant channels just keep
+#   their value, and all the drivers are removed.
+#-------------------------------------------------------------
+
+def getChannelAccess(rna, path, index):
+    if path[-1] == "]":
+        n = path.rfind("[")
+        base,key = path[:n],path[n+2:-2]
+        struct = (rna.path_resolve(base) if base else rna)
+        def getValue():
+            return struct[key]
+        def setValue(value):
+            struct[key] = value
+    else:
+        n = path.rfind(".")
+        if n < 0:
+            struct,attr = rna,path
+        else:
+            struct,attr = rna.path_resolve(path[:n]),path[n+1:]
+        if isinstance(getattr(struct, attr), (int, float, bool)):
+            def getValue():
+                return getattr(struct, attr)
+            def setValue(value):
+                setattr(struct, attr, value)
+        else:
+            def getValue():
+                return getattr(struct, attr)[index]
+            def setValue(value):
+                getattr(struct, attr)[index] = value
+    return getValue,setValue
+
+
+def getDrivenChannels(rig):
+    from .benchmark import getDriverOwners
+    channels = []
+    sums = []
+    for rna in getDriverOwners(rig):
+        if rna.animation_data is None:
+            continue
+        for fcu in rna.animation_data.drivers:
+            if fcu.mute:
+                continue
+            if '["DazSum' in fcu.data_path:
+                sums.append((rna, fcu.data_path, fcu.array_index))
+                continue
+            try:
+                getValue,setValue = getChannelAccess(rna, fcu.data_path, fcu.array_index)
+            except (ValueError, KeyError, AttributeError, TypeError):
+                print("Cannot bake %s: %s" % (rna.name, fcu.data_path))
+                continue
+            channels.append((rna, fcu.data_path, fcu.array_index, getValue, setValue))
+    return channels, sums
+
+
+def bakeDrivers(context, rig, first, last, eps=1e-5):
+    import time
+    import numpy as np
+    scn = context.scene
+    channels,sums = getDrivenChannels(rig)
+    if not channels:
+        raise DazError("No drivers to bake")
+
+    t1 = time.clock()
+    frames = np.arange(first, last+1, dtype=np.float32)
+    values = np.empty((len(frames), len(channels)), dtype=np.float32)
+    current = scn.frame_current
+    for n,frame in enumerate(range(first, last+1)):
+        scn.frame_set(frame)
+        values[n] = [getValue() for rna,path,idx,getValue,setValue in channels]
+    scn.frame_set(current)
+
+    for rna,path,idx,getValue,setValue in channels:
+        rna.driver_remove(path, idx)
+    for rna,path,idx in sums:
+        rna.driver_remove(path, idx)
+    for pb in rig.pose.bones:
+        for prop in list(pb.keys()):
+            if prop[0:6] == "DazSum":
+                del pb[prop]
+
+    spread = values.max(axis=0) - values.min(axis=0)
+    nconst = 0
+    co = np.empty((len(frames),2), dtype=np.float32)
+    co[:,0] = frames
+    for j,(rna,path,idx,getValue,setValue) in enumerate(channels):
+        if spread[j] < eps:
+            setValue(float(values[0,j]))
+            nconst += 1
+            continue
+        action = getBakeAction(rna)
+        fcu = action.fcurves.find(path, index=idx)
+        if fcu:
+            action.fcurves.remove(fcu)
+        fcu = action.fcurves.new(path, index=idx)
+        co[:,1] = values[:,j]
+        fcu.keyframe_points.add(len(frames))
+        fcu.keyframe_points.foreach_set("co", co.ravel())
+        fcu.update()
+    t2 = time.clock()
+    print("Baked %d channels over %d frames in %.3f seconds. %d constant channels dropped" %
+        (len(channels)-nconst, len(frames), t2-t1, nconst))
+
+
+def getBakeAction(rna):
+    if rna.animation_data is None:
+        rna.animation_data_create()
+    if rna.animation_data.action is None:
+        rna.animation_data.action = bpy.data.actions.new(name="%sBaked" % rna.name)
+    return rna.animation_data.action
+
+
+class DAZ_OT_BakeDrivers(bpy.types.Operator, BakeOptions):
+    bl_idname = "daz.bake_drivers"
+    bl_label = "Bake Drivers"
+    bl_description = "Bake all drivers of the active rig and its meshes to F-curves and remove the drivers"
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'ARMATURE')
+
+    def draw(self, context):
+        self.layout.prop(self, "frameStart")
+        self.layout.prop(self, "frameEnd")
+
+    def execute(self, context):
+        try:
+            if self.frameEnd < self.frameStart:
+                raise DazError("Last frame before first frame")
+            bakeDrivers(context, context.object, self.frameStart, self.frameEnd)
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        self.frameStart = context.scene.frame_start
+        self.frameEnd = context.scene.frame_end
+        context.window_manager.invoke_props_dialog(self)
+        return {'RUNNING_MODAL'}
+
+#----------------------------------------------------------
+#   Initialize
+#----------------------------------------------------------
+
+classes = [
+    DAZ_OT_BakeDrivers,
+]
+
+def initialize():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+
+def uninitialize():
+    for cls in classes:
+        bpy.utils.unregister_class(cls)
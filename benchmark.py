@@ -0,0 +1,515 @@
+# Copyright (c) 2016-2019, Thomas Larsson
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+import re
+import bpy
+from .error import *
+from .utils import *
+if bpy.app.version < (2,80,0):
+    from .buttons27 import BenchmarkOptions, ProfileOptions, MaterialBenchmarkOptions, JsonExportFile
+else:
+    from .buttons28 import BenchmarkOptions, ProfileOptions, MaterialBenchmarkOptions, JsonExportFile
+
+#-------------------------------------------------------------
+#   Playback benchmark.
+#   Wiggles all morph properties of the rig and steps through
+#   frames, so every driver that depends on them is reevaluated.
+#-------------------------------------------------------------
+
+def measurePlayback(context, rig, nframes):
+    import time
+    import math
+    from .daz import getPropGroupProps
+    scn = context.scene
+    props = [prop for prop in getPropGroupProps(rig) if prop in rig.keys()]
+    values = dict([(prop, rig[prop]) for prop in props])
+    frame = scn.frame_current
+    t1 = time.clock()
+    for n in range(nframes):
+        x = 0.5 + 0.5*math.sin(0.2*n)
+        for prop in props:
+            rig[prop] = x
+        rig.update_tag()
+        scn.frame_set(frame + n)
+    t2 = time.clock()
+    for prop,value in values.items():
+        rig[prop] = value
+    scn.frame_set(frame)
+    if t2 > t1:
+        return nframes/(t2-t1)
+    else:
+        return 0.0
+
+#-------------------------------------------------------------
+#   Corrective benchmark.
+#   Rotates every bone that drives a shapekey, so all corrective
+#   drivers are reevaluated each frame.
+#-------------------------------------------------------------
+
+def getCorrectiveDrivers(rig):
+    fcus = []
+    bnames = {}
+    for ob in rig.children:
+        if (ob.type != 'MESH' or
+            ob.data.shape_keys is None or
+            ob.data.shape_keys.animation_data is None):
+            continue
+        for fcu in ob.data.shape_keys.animation_data.drivers:
+            found = False
+            for var in fcu.driver.variables:
+                if var.type == 'TRANSFORMS':
+                    trg = var.targets[0]
+                    if trg.id == rig and trg.bone_target in rig.pose.bones.keys():
+                        bnames[trg.bone_target] = True
+                        found = True
+            if found:
+                fcus.append(fcu)
+    return fcus, list(bnames.keys())
+
+
+def measureCorrectives(context, rig, nframes):
+    import time
+    import math
+    scn = context.scene
+    fcus,bnames = getCorrectiveDrivers(rig)
+    pbs = [rig.pose.bones[bname] for bname in bnames]
+    rots = dict([(pb.name, pb.rotation_euler.copy()) for pb in pbs])
+    quats = dict([(pb.name, pb.rotation_quaternion.copy()) for pb in pbs])
+    frame = scn.frame_current
+    t1 = time.clock()
+    for n in range(nframes):
+        x = 0.8*math.sin(0.2*n)
+        for pb in pbs:
+            if pb.rotation_mode == 'QUATERNION':
+                pb.rotation_quaternion = (math.cos(x/2), math.sin(x/2), 0, 0)
+            else:
+                pb.rotation_euler = (x, 0.5*x, 0.25*x)
+        rig.update_tag()
+        scn.frame_set(frame + n)
+    t2 = time.clock()
+    for pb in pbs:
+        pb.rotation_euler = rots[pb.name]
+        pb.rotation_quaternion = quats[pb.name]
+    scn.frame_set(frame)
+    npython = len([fcu for fcu in fcus if usesPython(fcu.driver)])
+    if t2 > t1:
+        fps = nframes/(t2-t1)
+    else:
+        fps = 0.0
+    return fps, len(fcus), npython
+
+
+class DAZ_OT_BenchmarkDrivers(bpy.types.Operator, BenchmarkOptions):
+    bl_idname = "daz.benchmark_drivers"
+    bl_label = "Benchmark Drivers"
+    bl_description = "Measure playback speed of the morph drivers of the active rig"
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'ARMATURE')
+
+    def draw(self, context):
+        self.layout.prop(self, "nframes")
+        self.layout.prop(self, "useCompare")
+        self.layout.prop(self, "useCorrectives")
+
+    def execute(self, context):
+        try:
+            self.benchmark(context)
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_props_dialog(self)
+        return {'RUNNING_MODAL'}
+
+
+    def benchmark(self, context):
+        from .daz import rebuildPropGroupDrivers
+        rig = context.object
+        if self.useCompare:
+            rebuildPropGroupDrivers(rig, legacy=True)
+            updateDrivers(rig)
+            legacy = measurePlayback(context, rig, self.nframes)
+            rebuildPropGroupDrivers(rig, legacy=False)
+            updateDrivers(rig)
+            fps = measurePlayback(context, rig, self.nframes)
+            print("Legacy evalMorphs drivers: %.1f fps" % legacy)
+            print("Simple expression drivers: %.1f fps" % fps)
+            if legacy > 0:
+                print("Speedup: %.2fx" % (fps/legacy))
+        else:
+            fps = measurePlayback(context, rig, self.nframes)
+            print("%s: %.1f fps" % (rig.name, fps))
+        if self.useCorrectives:
+            fps,ndrivers,npython = measureCorrectives(context, rig, self.nframes)
+            print("%d corrective drivers, %d using Python: %.1f fps" % (ndrivers, npython, fps))
+
+#-------------------------------------------------------------
+#   Driver inventory
+#-------------------------------------------------------------
+
+DriverTokens = re.compile(r'[A-Za-z_]\w*|\d+\.?\d*|\S')
+DriverCalls = re.compile(r'([A-Za-z_]\w*)\s*\(')
+SimpleFunctions = ["min", "max", "sin", "cos", "tan", "asin", "acos", "atan",
+    "atan2", "exp", "log", "sqrt", "pow", "abs", "floor", "ceil", "round",
+    "int", "fmod", "radians", "degrees", "clamp", "lerp", "smoothstep"]
+
+def getDriverOwners(rig):
+    owners = [rig]
+    if rig.type == 'ARMATURE':
+        owners.append(rig.data)
+    for ob in rig.children:
+        owners.append(ob)
+        if ob.type == 'MESH' and ob.data.shape_keys:
+            owners.append(ob.data.shape_keys)
+    return owners
+
+
+def usesPython(drv):
+    if drv.type != 'SCRIPTED':
+        return False
+    if hasattr(drv, "is_simple_expression"):
+        return (not drv.is_simple_expression)
+    expr = drv.expression
+    if "self" in expr or "[" in expr:
+        return True
+    for func in DriverCalls.findall(expr):
+        if func not in SimpleFunctions:
+            return True
+    return False
+
+
+def getDriverInputs(rig, drv):
+    inputs = []
+    for var in drv.variables:
+        if var.type == 'SINGLE_PROP':
+            trg = var.targets[0]
+            if trg.id:
+                inputs.append((trg.id.as_pointer(), trg.data_path))
+        elif var.type == 'TRANSFORMS':
+            trg = var.targets[0]
+            if trg.id and trg.bone_target:
+                inputs.append((trg.id.as_pointer(), 'pose.bones["%s"].' % trg.bone_target))
+        else:
+            for trg in var.targets:
+                if trg.id and trg.bone_target:
+                    inputs.append((trg.id.as_pointer(), 'pose.bones["%s"].' % trg.bone_target))
+    return inputs
+
+
+def getDriverGroup(rna, fcu):
+    words = fcu.data_path.split('"')
+    if words[0] == "pose.bones[" and len(words) > 1:
+        return "%s:%s" % (rna.name, words[1])
+    elif words[0] == "key_blocks[":
+        return "%s:shapekeys" % rna.user.name
+    else:
+        return "%s:%s" % (rna.name, words[0])
+
+
+def inventoryDrivers(rig):
+    entries = []
+    outputs = {}
+    for rna in getDriverOwners(rig):
+        if rna.animation_data is None:
+            continue
+        for fcu in rna.animation_data.drivers:
+            drv = fcu.driver
+            entry = {
+                "owner" : rna.name,
+                "path" : fcu.data_path,
+                "index" : fcu.array_index,
+                "group" : getDriverGroup(rna, fcu),
+                "type" : drv.type,
+                "expression" : drv.expression,
+                "tokens" : len(DriverTokens.findall(drv.expression)),
+                "variables" : len(drv.variables),
+                "python" : usesPython(drv),
+                "muted" : fcu.mute,
+                "depth" : 0,
+                "fcurve" : fcu,
+                "inputs" : getDriverInputs(rig, drv),
+                "key" : (rna.as_pointer(), fcu.data_path),
+                "rna" : rna,
+            }
+            entries.append(entry)
+            addOutput(outputs, entry["key"], entry)
+            words = fcu.data_path.split('"')
+            if words[0] == "pose.bones[" and len(words) == 3:
+                addOutput(outputs, (rna.as_pointer(), 'pose.bones["%s"].' % words[1]), entry)
+    for entry in entries:
+        getDriverDepth(entry, outputs, {})
+    return entries
+
+
+def addOutput(outputs, key, entry):
+    if key not in outputs.keys():
+        outputs[key] = []
+    outputs[key].append(entry)
+
+
+def getDriverDepth(entry, outputs, visiting):
+    if entry["depth"] > 0:
+        return entry["depth"]
+    key = (entry["key"], entry["index"])
+    if key in visiting.keys():
+        return 1
+    visiting[key] = True
+    depth = 0
+    for input in entry["inputs"]:
+        if input in outputs.keys():
+            for output in outputs[input]:
+                depth = max(depth, getDriverDepth(output, outputs, visiting))
+    del visiting[key]
+    entry["depth"] = depth + 1
+    return entry["depth"]
+
+
+def getStaticCost(entry):
+    cost = entry["tokens"] + 2*entry["variables"]
+    if entry["python"]:
+        cost *= 10
+    return cost*entry["depth"]
+
+#-------------------------------------------------------------
+#   Driver profiler
+#-------------------------------------------------------------
+
+def profileDrivers(context, rig, nframes, useTiming=True):
+    entries = inventoryDrivers(rig)
+    groups = {}
+    for entry in entries:
+        entry["static_cost"] = getStaticCost(entry)
+        if entry["group"] not in groups.keys():
+            groups[entry["group"]] = {"group" : entry["group"], "drivers" : 0, "python" : 0, "static_cost" : 0, "ms" : 0.0}
+        group = groups[entry["group"]]
+        group["drivers"] += 1
+        group["python"] += int(entry["python"])
+        group["static_cost"] += entry["static_cost"]
+
+    baseline = 0.0
+    if useTiming and entries:
+        fps = measurePlayback(context, rig, nframes)
+        baseline = (1000.0/fps if fps > 0 else 0.0)
+        for gname,group in groups.items():
+            fcus = [entry["fcurve"] for entry in entries
+                    if entry["group"] == gname and not entry["muted"]]
+            for fcu in fcus:
+                fcu.mute = True
+            try:
+                fps = measurePlayback(context, rig, nframes)
+            finally:
+                for fcu in fcus:
+                    fcu.mute = False
+            if fps > 0:
+                group["ms"] = baseline - 1000.0/fps
+
+    for entry in entries:
+        del entry["fcurve"]
+        del entry["inputs"]
+        del entry["key"]
+        del entry["rna"]
+    entries.sort(key=lambda entry: -entry["static_cost"])
+    grouplist = list(groups.values())
+    if useTiming:
+        grouplist.sort(key=lambda group: -group["ms"])
+    else:
+        grouplist.sort(key=lambda group: -group["static_cost"])
+    return {
+        "rig" : rig.name,
+        "frames" : nframes,
+        "baseline_ms" : baseline,
+        "drivers" : len(entries),
+        "python_drivers" : len([entry for entry in entries if entry["python"]]),
+        "max_depth" : max([entry["depth"] for entry in entries] + [0]),
+        "groups" : grouplist,
+        "inventory" : entries,
+    }
+
+
+def saveDriverReport(report, filepath, useCsv):
+    import json
+    import csv
+    import os
+    with open(filepath, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2)
+    print("Driver report saved to %s" % filepath)
+    if useCsv:
+        csvpath = os.path.splitext(filepath)[0] + ".csv"
+        fields = ["owner", "path", "index", "group", "type", "python",
+                  "variables", "tokens", "depth", "static_cost", "muted", "expression"]
+        with open(csvpath, "w", encoding="utf-8", newline="") as fp:
+            writer = csv.DictWriter(fp, fields)
+            writer.writeheader()
+            for entry in report["inventory"]:
+                writer.writerow(dict([(field, entry[field]) for field in fields]))
+        print("Driver table saved to %s" % csvpath)
+
+
+class DAZ_OT_ProfileDrivers(bpy.types.Operator, JsonExportFile, ProfileOptions):
+    bl_idname = "daz.profile_drivers"
+    bl_label = "Profile Drivers"
+    bl_description = "Inventory and time the drivers of the active rig and its meshes, and save a ranked report"
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'ARMATURE')
+
+    def draw(self, context):
+        self.layout.prop(self, "nframes")
+        self.layout.prop(self, "useTiming")
+        self.layout.prop(self, "useCsv")
+
+    def execute(self, context):
+        try:
+            rig = context.object
+            report = profileDrivers(context, rig, self.nframes, self.useTiming)
+            saveDriverReport(report, bpy.path.ensure_ext(self.filepath, ".json"), self.useCsv)
+            print("%d drivers, %d use Python, max depth %d" %
+                (report["drivers"], report["python_drivers"], report["max_depth"]))
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+#-------------------------------------------------------------
+#   Material benchmark.
+#   Builds a scene of synthetic Iray materials, with and without
+#   the channel resolution table.
+#-------------------------------------------------------------
+
+def getSyntheticStruct(n):
+    x = (n % 97)/97.0
+    y = (n % 31)/31.0
+    channels = {
+        "Diffuse Color" : (x, 0.5, y),
+        "Diffuse Roughness" : y,
+        "Base Mixing" : 0,
+        "Glossy Layered Weight" : 0.5*x,
+        "Glossy Color" : (1, 1, 1),
+        "Glossy Roughness" : 0.2 + 0.5*y,
+        "Glossy Reflectivity" : 0.5,
+        "Translucency Weight" : (0.2 if n % 2 else 0),
+        "Translucency Color" : (x, y, 0.5),
+        "Refraction Weight" : 0,
+        "Refraction Index" : 1.5,
+        "Cutout Opacity" : 1,
+        "Top Coat Weight" : 0,
+        "Emission Color" : (0, 0, 0),
+        "Bump Strength" : 1,
+        "Normal Map" : 1,
+        "Thin Walled" : False,
+        "Horizontal Tiles" : 1,
+        "Vertical Tiles" : 1,
+    }
+    struct = {"id" : "Benchmark_%03d" % n, "name" : "Benchmark_%03d" % n}
+    for key,value in channels.items():
+        struct[key] = {"channel" : {"id" : key, "label" : key, "current_value" : value}}
+    return struct
+
+
+def measureMaterials(context, nmats, useResolution):
+    import time
+    from .cycles import CyclesMaterial
+    from .material import Material
+    from .settings import theSettings
+    theSettings.reset(context.scene)
+    theSettings.reuseMaterials = False
+    groups = [grp.name for grp in bpy.data.node_groups]
+    useOld = Material.useResolution
+    Material.useResolution = useResolution
+    mats = []
+    try:
+        for n in range(nmats):
+            struct = getSyntheticStruct(n)
+            mat = CyclesMaterial("")
+            mat.parse(struct)
+            mat.update(struct)
+            mats.append(mat)
+        t1 = time.clock()
+        for mat in mats:
+            mat.build(context)
+        t2 = time.clock()
+    finally:
+        Material.useResolution = useOld
+        for mat in mats:
+            if mat.rna:
+                bpy.data.materials.remove(mat.rna)
+        for grp in list(bpy.data.node_groups):
+            if grp.name not in groups:
+                bpy.data.node_groups.remove(grp)
+        theSettings.reset(context.scene)
+    return t2-t1
+
+
+class DAZ_OT_BenchmarkMaterials(bpy.types.Operator, MaterialBenchmarkOptions):
+    bl_idname = "daz.benchmark_materials"
+    bl_label = "Benchmark Materials"
+    bl_description = "Measure the build time of a scene of synthetic materials"
+
+    def draw(self, context):
+        self.layout.prop(self, "nmaterials")
+        self.layout.prop(self, "useCompare")
+
+    def execute(self, context):
+        try:
+            if self.useCompare:
+                t = measureMaterials(context, self.nmaterials, False)
+                print("Without resolution table: %d materials in %.2f s" % (self.nmaterials, t))
+            t = measureMaterials(context, self.nmaterials, True)
+            print("With resolution table: %d materials in %.2f s" % (self.nmaterials, t))
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_props_dialog(self)
+        return {'RUNNING_MODAL'}
+
+#----------------------------------------------------------
+#   Initialize
+#----------------------------------------------------------
+
+classes = [
+    DAZ_OT_BenchmarkDrivers,
+    DAZ_OT_ProfileDrivers,
+    DAZ_OT_BenchmarkMaterials,
+]
+
+def initialize():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+
+def uninitialize():
+    for cls in classes:
+        bpy.utils.unregister_class(cls)
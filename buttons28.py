@@ -225,6 +225,60 @@ class ResizeOptions:
         description = "Overwrite the original image files.",
         default = False)
 
+    useAllTiers : BoolProperty(
+        name = "All Tiers",
+        description = "Also make the resized images for all smaller numbers of steps",
+        default = False)
+
+
+class PlannerOptions:
+    targetDensity : FloatProperty(
+        name = "Texels Per Unit",
+        description = "Texture density to keep, in texels per Blender unit of surface",
+        min = 1, max = 100000,
+        default = 1000)
+
+    useCamera : BoolProperty(
+        name = "Use Camera",
+        description = "Get the target density from the distance to the scene camera and the render resolution",
+        default = False)
+
+    texelsPerPixel : FloatProperty(
+        name = "Texels Per Pixel",
+        description = "Texture density to keep, in texels per rendered pixel",
+        min = 0.1, max = 8,
+        default = 1.0)
+
+    maxSteps : IntProperty(
+        name = "Max Steps",
+        description = "Largest number of resize steps to use",
+        min = 0, max = 8,
+        default = 3)
+
+    useApply : BoolProperty(
+        name = "Apply",
+        description = "Change the textures. Otherwise only report the plan",
+        default = True)
+
+
+class AtlasOptions:
+    atlasSize : IntProperty(
+        name = "Atlas Size",
+        description = "Width and height of the atlas images",
+        min = 256, max = 16384,
+        default = 2048)
+
+    margin : IntProperty(
+        name = "Margin",
+        description = "Pixels added around each uv island to avoid seams",
+        min = 0, max = 64,
+        default = 4)
+
+    keepTransparent : BoolProperty(
+        name = "Keep Transparent",
+        description = "Keep transparent and refractive materials, like eye moisture, as separate materials",
+        default = True)
+
 #-------------------------------------------------------------
 #   morphing.py
 #-------------------------------------------------------------
@@ -332,6 +386,73 @@ class MergeShapekeysOptions:
         name = "Shapekey 2",
         description = "Shapekey to merge")
 
+class BenchmarkOptions:
+    nframes : IntProperty(
+        name = "Frames",
+        description = "Number of frames to play",
+        min = 1, max = 10000,
+        default = 100)
+
+    useCompare : BoolProperty(
+        name = "Compare With Legacy",
+        description = "Also measure with the old evalMorphs drivers, and restore simple expression drivers afterwards",
+        default = True)
+
+    useCorrectives : BoolProperty(
+        name = "Correctives",
+        description = "Measure corrective shapekey drivers by rotating their driver bones",
+        default = False)
+
+
+class MaterialBenchmarkOptions:
+    nmaterials : IntProperty(
+        name = "Materials",
+        description = "Number of synthetic materials to build",
+        min = 1, max = 10000,
+        default = 500)
+
+    useCompare : BoolProperty(
+        name = "Compare Without Table",
+        description = "Also measure without the channel resolution table",
+        default = True)
+
+
+class ProfileOptions:
+    nframes : IntProperty(
+        name = "Frames",
+        description = "Number of frames to play for each timing",
+        min = 1, max = 1000,
+        default = 20)
+
+    useTiming : BoolProperty(
+        name = "Timing",
+        description = "Time playback with each driver group muted. Slow for large rigs",
+        default = True)
+
+    useCsv : BoolProperty(
+        name = "CSV Table",
+        description = "Also save the driver inventory as a csv file",
+        default = True)
+
+
+class BakeOptions:
+    frameStart : IntProperty(
+        name = "Start",
+        description = "First frame to bake",
+        default = 1)
+
+    frameEnd : IntProperty(
+        name = "End",
+        description = "Last frame to bake",
+        default = 250)
+
+
+class VariantOptions:
+    useNewObjects : BoolProperty(
+        name = "New Meshes",
+        description = "Make a new mesh for each variant instead of a shapekey",
+        default = False)
+
 #-------------------------------------------------------------
 #   String properties
 #-------------------------------------------------------------
@@ -371,6 +492,12 @@ class TypePrefixCat:
 class UseOpenBool:
     useOpen : BoolProperty()
 
+class ReportOnlyBool:
+    reportOnly : BoolProperty(
+        name = "Report Only",
+        description = "Only report what would be removed",
+        default = False)
+
 class UseAllBool:
     useAll : BoolProperty()
 
@@ -37,20 +37,86 @@ from .material import WHITE
 # ---------------------------------------------------------------------
 
 class MaterialGroup:
-    def __init__(self, node, name, parent, ncols):
-        self.group = bpy.data.node_groups.new(name, 'ShaderNodeTree')
+    def __init__(self, node, name, parent, ncols, key=None):
+        self.group = findNodeGroup(key)
+        self.reused = (self.group is not None)
+        if not self.reused:
+            self.group = bpy.data.node_groups.new(name, 'ShaderNodeTree')
+            registerNodeGroup(self.group, key)
         node.node_tree = self.group
         self.nodes = self.group.nodes
         self.links = self.group.links
-        self.inputs = self.addNode(0, "NodeGroupInput")
-        self.outputs = self.addNode(ncols, "NodeGroupOutput")
         self.parent = parent
+        if self.reused:
+            self.inputs = self.outputs = None
+        else:
+            self.inputs = self.addNode(0, "NodeGroupInput")
+            self.outputs = self.addNode(ncols, "NodeGroupOutput")
 
 
 class CyclesGroup(MaterialGroup, CyclesTree):
-    def __init__(self, node, name, parent, ncols):
+    def __init__(self, node, name, parent, ncols, key=None):
         CyclesTree.__init__(self, parent.material)
-        MaterialGroup.__init__(self, node, name, parent, ncols)
+        MaterialGroup.__init__(self, node, name, parent, ncols, key)
+
+# ---------------------------------------------------------------------
+#   Node group registry.
+#   Groups that only depend on their type and parameters are built
+#   once and then reused, also by later imports. Registered groups
+#   are tagged with DazGroupKey, so groups in bpy.data are found.
+#   Groups with mapping nodes are never shared, since addUdim
+#   changes the mapping nodes of each material.
+# ---------------------------------------------------------------------
+
+theGroupRegistry = None
+
+def getGroupRegistry():
+    global theGroupRegistry
+    if theGroupRegistry is None:
+        theGroupRegistry = {}
+        for group in bpy.data.node_groups:
+            key = group.get("DazGroupKey")
+            if key and key not in theGroupRegistry.keys():
+                theGroupRegistry[key] = group
+    return theGroupRegistry
+
+
+def findNodeGroup(key):
+    if key is None:
+        return None
+    registry = getGroupRegistry()
+    group = registry.get(key)
+    if group is not None:
+        try:
+            if group.get("DazGroupKey") == key:
+                return group
+        except ReferenceError:
+            pass
+        del registry[key]
+    return None
+
+
+def registerNodeGroup(group, key):
+    if key is None:
+        return
+    group["DazGroupKey"] = key
+    getGroupRegistry()[key] = group
+
+
+def clearNodeGroups():
+    global theGroupRegistry
+    theGroupRegistry = None
+
+
+def getLieKey(assets, maps, colorSpace):
+    import hashlib
+    data = [colorSpace]
+    for asset,map in zip(assets, maps):
+        if asset.hasMapping(map):
+            return None
+        data.append((asset.map.url, tuple(asset.map.color), map.url,
+                     map.operation, map.transparency, map.invert, map.ismask))
+    return "Lie %s" % hashlib.md5(repr(data).encode("utf-8")).hexdigest()
 
 # ---------------------------------------------------------------------
 #   Shell Group
@@ -99,7 +165,9 @@ class ShellPbrGroup(ShellGroup, PbrTree):
 class FresnelGroup(CyclesGroup):
 
     def __init__(self, node, parent):
-        CyclesGroup.__init__(self, node, "Fresnel", parent, 4)
+        CyclesGroup.__init__(self, node, "Fresnel", parent, 4, "Fresnel")
+        if self.reused:
+            return
         self.group.inputs.new("NodeSocketFloat", "IOR")
         self.group.inputs.new("NodeSocketFloat", "Roughness")
         self.group.inputs.new("NodeSocketVector", "Normal")
@@ -107,6 +175,8 @@ class FresnelGroup(CyclesGroup):
 
 
     def addNodes(self):
+        if self.reused:
+            return
         geo = self.addNode(1, "ShaderNodeNewGeometry")
 
         bump = self.addNode(1, "ShaderNodeBump")
@@ -135,7 +205,9 @@ class FresnelGroup(CyclesGroup):
 class DualLobeGroup(CyclesGroup):
 
     def __init__(self, node, parent):
-        CyclesGroup.__init__(self, node, "Dual Lobe BSDF", parent, 4)
+        CyclesGroup.__init__(self, node, "Dual Lobe BSDF", parent, 4, "Dual Lobe BSDF")
+        if self.reused:
+            return
         self.group.inputs.new("NodeSocketShader", "Shader")
         self.group.inputs.new("NodeSocketColor", "Color")
         self.group.inputs.new("NodeSocketFloat", "IOR")
@@ -147,6 +219,8 @@ class DualLobeGroup(CyclesGroup):
 
 
     def addNodes(self):
+        if self.reused:
+            return
         glossy1 = self.addGlossy("Roughness 1")
         glossy2 = self.addGlossy("Roughness 2")
         mix = self.addNode(3, "ShaderNodeMixShader")
@@ -182,7 +256,9 @@ class DualLobeGroup(CyclesGroup):
 class DisplacementGroup(CyclesGroup):
 
     def __init__(self, node, parent):
-        CyclesGroup.__init__(self, node, "Diplacement Converter", parent, 4)
+        CyclesGroup.__init__(self, node, "Diplacement Converter", parent, 4, "Displacement Converter")
+        if self.reused:
+            return
         self.group.inputs.new("NodeSocketFloat", "Texture")
         self.group.inputs.new("NodeSocketFloat", "Strength")
         self.group.inputs.new("NodeSocketFloat", "Difference")
@@ -191,6 +267,8 @@ class DisplacementGroup(CyclesGroup):
 
 
     def addNodes(self):
+        if self.reused:
+            return
         mult1 = self.addNode(1, "ShaderNodeMath")
         mult1.operation = 'MULTIPLY'
         self.links.new(self.inputs.outputs["Texture"], mult1.inputs[0])
@@ -215,7 +293,9 @@ class DisplacementGroup(CyclesGroup):
 class GlassGroup(CyclesGroup):
 
     def __init__(self, node, parent):
-        CyclesGroup.__init__(self, node, "MultiGlass", parent, 6)
+        CyclesGroup.__init__(self, node, "MultiGlass", parent, 6, "MultiGlass")
+        if self.reused:
+            return
         self.group.inputs.new("NodeSocketFloat", "ThinWall")
         self.group.inputs.new("NodeSocketColor", "RefractionColor")
         self.group.inputs.new("NodeSocketColor", "TransmissionColor")
@@ -232,6 +312,8 @@ class GlassGroup(CyclesGroup):
 
 
     def addNodes(self):
+        if self.reused:
+            return
         transColor = self.addNode(2, "ShaderNodeMixRGB", "Trans Color")
         transColor.name = "TransColor"
         transColor.blend_type = 'MULTIPLY'
@@ -304,7 +386,9 @@ class GlassGroup(CyclesGroup):
 class ComplexGlassGroup(CyclesGroup):
 
     def __init__(self, node, parent):
-        CyclesGroup.__init__(self, node, "Complex MultiGlass", parent, 7)
+        CyclesGroup.__init__(self, node, "Complex MultiGlass", parent, 7, "Complex MultiGlass")
+        if self.reused:
+            return
         self.group.inputs.new("NodeSocketShader", "BaseShader")
 
         self.group.inputs.new("NodeSocketFloat", "RefractionWeight")
@@ -332,6 +416,8 @@ class ComplexGlassGroup(CyclesGroup):
 
 
     def addNodes(self):
+        if self.reused:
+            return
         thick = self.addNode(1, "ShaderNodeMath", "Thick")
         thick.operation = 'SUBTRACT'
         thick.inputs[0].default_value = 1.0
@@ -501,14 +587,18 @@ class ComplexGlassGroup(CyclesGroup):
 
 class LieGroup(CyclesGroup):
 
-    def __init__(self, node, name, parent):
-        CyclesGroup.__init__(self, node, name, parent, 6)
+    def __init__(self, node, name, parent, key=None):
+        CyclesGroup.__init__(self, node, name, parent, 6, key)
+        if self.reused:
+            return
         self.group.inputs.new("NodeSocketVector", "Vector")
         self.texco = self.inputs.outputs[0]
         self.group.outputs.new("NodeSocketColor", "Color")
 
 
     def addTextureNodes(self, assets, maps, colorSpace):
+        if self.reused:
+            return
         texnodes = []
         for idx,asset in enumerate(assets):
             texnode,isnew = self.addSingleTexture(3, asset, maps[idx], colorSpace)
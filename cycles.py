@@ -30,7 +30,7 @@ import bpy
 import math
 import os
 from mathutils import Vector, Matrix, Color
-from .material import Material, WHITE, GREY, BLACK, isWhite, isBlack
+from .material import Material, WHITE, GREY, BLACK, isWhite, isBlack, unregisterMaterial
 from .frommat import FromCycles
 from .settings import theSettings
 from .error import DazError
@@ -42,6 +42,8 @@ from .utils import *
 
 class CyclesMaterial(Material):
 
+    useSharing = True
+
     def __init__(self, fileref):
         Material.__init__(self, fileref)
         self.tree = None
@@ -60,6 +62,8 @@ class CyclesMaterial(Material):
         if self.ignore:
             return
         Material.build(self, context)
+        if self.shared:
+            return
 
         from .pbr import PbrTree
         if bpy.app.version >= (2, 78, 0):
@@ -97,6 +101,8 @@ class CyclesMaterial(Material):
         else:
             self.tree = CyclesTree(self)
         self.tree.build(context)
+        if self.geosockets or self.hideMaterial:
+            unregisterMaterial(self.rna, self.signature)
 
 
     def postbuild(self, context):
@@ -1048,13 +1054,13 @@ class CyclesTree(FromCycles):
                 self.linkVector(self.texco, texnode)
             return texnode
 
-        from .cgroup import LieGroup
+        from .cgroup import LieGroup, getLieKey
         node = self.addNode(2, "ShaderNodeGroup")
         try:
             name = os.path.basename(assets[0].map.url)
         except:
             name = "Group"
-        group = LieGroup(node, name, self)
+        group = LieGroup(node, name, self, getLieKey(assets, maps, colorSpace))
         self.linkVector(self.texco, node)
         group.addTextureNodes(assets, maps, colorSpace)
         return node
@@ -26,6 +26,7 @@
 # either expressed or implied, of the FreeBSD Project.
 
 import os
+import re
 import bpy
 from bpy.props import *
 from .error import *
@@ -84,28 +85,237 @@ def evalMorphs(pb, idx, key):
 
 
 def addCustomDriver(fcu, rig, pb, init, value, prop, key, errors, default=0.0):
-    from .driver import addTransformVar, driverHasVar
     fcu.driver.type = 'SCRIPTED'
     if abs(value) > 1e-4:
-        expr = 'evalMorphs(self, %d, "%s")' % (fcu.array_index, key)
-        drvexpr = fcu.driver.expression[len(init):]
-        if drvexpr in ["0.000", "-0.000"]:
-            if init:
-                fcu.driver.expression = init + "+" + expr
-            else:
-                fcu.driver.expression = expr
-        elif expr not in drvexpr:
-            if init:
-                fcu.driver.expression = init + "(" + drvexpr + "+" + expr + ")"
-            else:
-                fcu.driver.expression = drvexpr + "+" + expr
-        fcu.driver.use_self = True
         addSelfRef(rig, pb)
         addPropGroup(rig, pb, fcu.array_index, key, prop, value, default)
+        buildPropGroupDriver(fcu, rig, pb, key)
         if len(fcu.modifiers) > 0:
             fmod = fcu.modifiers[0]
             fcu.modifiers.remove(fmod)
 
+#-------------------------------------------------------------
+#   Simple expression drivers for property groups.
+#   Each prop in the group becomes a driver variable m0, m1, ...
+#   and the expression is a plain linear sum, which Blender
+#   evaluates without calling Python. Long sums are split into
+#   chunks stored in DazSum pose bone properties, that are summed
+#   by variables c0, c1, ... in the main driver.
+#-------------------------------------------------------------
+
+MaxExprLength = 255
+SimpleVar = re.compile(r'^[mc]\d+$')
+SimpleExpr = re.compile(r'^(1\.0-)?\([-+0-9.*mc]*\)$')
+LegacyExpr = re.compile(r'evalMorphs\(self, *(\d+), *"(\w+)"\)')
+SimpleBase = re.compile(r'^([+-]?[0-9.]+)(?=[+-]|$)')
+
+def getPropGroups(pb, key):
+    return pb.DazLocProps if key == "Loc" else pb.DazRotProps if key == "Rot" else pb.DazScaleProps
+
+
+def getPropGroupChannels(pb):
+    if pb.rotation_mode == 'QUATERNION':
+        rot = "rotation_quaternion"
+    else:
+        rot = "rotation_euler"
+    return [("Loc", "location", pb.DazLocProps),
+            ("Rot", rot, pb.DazRotProps),
+            ("Sca", "scale", pb.DazScaleProps)]
+
+
+def getDriverInit(fcu):
+    if (fcu.data_path[-19:] == "rotation_quaternion" and
+        fcu.array_index == 0):
+        return "1.0-"
+    else:
+        return ""
+
+
+def isPropGroupDriver(fcu):
+    expr = fcu.driver.expression
+    return (LegacyExpr.search(expr) is not None or
+            SimpleExpr.match(expr) is not None or
+            '["DazSum' in fcu.data_path)
+
+
+def stripParens(expr):
+    while expr[:1] == "(" and expr[-1:] == ")":
+        depth = 0
+        for n,c in enumerate(expr):
+            if c == "(":
+                depth += 1
+            elif c == ")":
+                depth -= 1
+            if depth == 0 and n < len(expr)-1:
+                return expr
+        expr = expr[1:-1]
+    return expr
+
+
+def getBaseExpression(expr, init):
+    if SimpleExpr.match(expr):
+        # The base is the number before the first term
+        if expr[:4] == "1.0-":
+            expr = expr[4:]
+        match = SimpleBase.match(expr[1:-1])
+        if match is None:
+            return ""
+        expr = match.group(1)
+    else:
+        expr = LegacyExpr.sub("", expr)
+        if init and expr[:len(init)] == init:
+            expr = expr[len(init):]
+        elif init:
+            # A new driver's expression is the current value of the
+            # channel, which already includes the init value
+            try:
+                float(expr)
+                return ""
+            except ValueError:
+                pass
+    expr = stripParens(expr.strip()).strip("+ ")
+    try:
+        if abs(float(expr)) < 1e-4:
+            return ""
+    except ValueError:
+        pass
+    return expr
+
+
+def formatFactor(x):
+    string = ("%.6f" % x).rstrip("0").rstrip(".")
+    if string in ["", "-0"]:
+        return "0"
+    return string
+
+
+def clearPropGroupDriver(fcu, rig, pb, key):
+    drv = fcu.driver
+    for var in list(drv.variables):
+        if SimpleVar.match(var.name):
+            drv.variables.remove(var)
+    prefix = "DazSum%s%d_" % (key, fcu.array_index)
+    for prop in list(pb.keys()):
+        if prop[0:len(prefix)] == prefix:
+            try:
+                pb.driver_remove('["%s"]' % prop)
+            except TypeError:
+                pass
+            del pb[prop]
+
+
+def addSimpleVar(drv, vname, rig, path):
+    var = drv.variables.new()
+    var.name = vname
+    var.type = 'SINGLE_PROP'
+    trg = var.targets[0]
+    trg.id_type = 'OBJECT'
+    trg.id = rig
+    trg.data_path = path
+
+
+def buildPropGroupDriver(fcu, rig, pb, key):
+    idx = fcu.array_index
+    init = getDriverInit(fcu)
+    base = getBaseExpression(fcu.driver.expression, init)
+    clearPropGroupDriver(fcu, rig, pb, key)
+
+    terms = []
+    const = 0.0
+    for pg in getPropGroups(pb, key):
+        if pg.index == idx:
+            vname = "m%d" % len(terms)
+            factor = formatFactor(pg.factor)
+            if factor[0] != "-":
+                factor = "+" + factor
+            terms.append((vname, '["%s"]' % pg.prop, "%s*%s" % (factor, vname)))
+            const -= pg.factor*pg.default
+    if abs(const) > 1e-6:
+        tail = formatFactor(const)
+        if tail[0] != "-":
+            tail = "+" + tail
+    else:
+        tail = ""
+
+    drv = fcu.driver
+    body = base + "".join([term[2] for term in terms]) + tail
+    if len(init) + len(body) + 2 > MaxExprLength:
+        chunks = [[]]
+        length = 0
+        for term in terms:
+            if length + len(term[2]) > MaxExprLength:
+                chunks.append([])
+                length = 0
+            chunks[-1].append(term)
+            length += len(term[2])
+        body = base
+        for n,chunk in enumerate(chunks):
+            prop = "DazSum%s%d_%d" % (key, idx, n)
+            addSumDriver(rig, pb, prop, chunk)
+            vname = "c%d" % n
+            addSimpleVar(drv, vname, rig, 'pose.bones["%s"]["%s"]' % (pb.name, prop))
+            body += "+" + vname
+        body += tail
+    else:
+        for vname,path,term in terms:
+            addSimpleVar(drv, vname, rig, path)
+
+    if body[:1] == "+":
+        body = body[1:]
+    if not body:
+        body = "0"
+    drv.type = 'SCRIPTED'
+    drv.expression = init + "(" + body + ")"
+    if hasattr(drv, "use_self"):
+        drv.use_self = False
+
+
+def addSumDriver(rig, pb, prop, terms):
+    pb[prop] = 0.0
+    fcu = pb.driver_add('["%s"]' % prop)
+    drv = fcu.driver
+    drv.type = 'SCRIPTED'
+    for vname,path,term in terms:
+        addSimpleVar(drv, vname, rig, path)
+    body = "".join([term[2] for term in terms])
+    if body[:1] == "+":
+        body = body[1:]
+    drv.expression = body
+    if len(fcu.modifiers) > 0:
+        fcu.modifiers.remove(fcu.modifiers[0])
+
+
+def buildLegacyDriver(fcu, rig, pb, key):
+    init = getDriverInit(fcu)
+    base = getBaseExpression(fcu.driver.expression, init)
+    clearPropGroupDriver(fcu, rig, pb, key)
+    expr = 'evalMorphs(self, %d, "%s")' % (fcu.array_index, key)
+    if base:
+        expr = base + "+" + expr
+    if init:
+        expr = init + "(" + expr + ")"
+    fcu.driver.type = 'SCRIPTED'
+    fcu.driver.expression = expr
+    fcu.driver.use_self = True
+
+
+def rebuildPropGroupDrivers(rig, legacy=False):
+    from .formula import getBoneFcurves
+    nfcus = 0
+    for pb in rig.pose.bones:
+        for key,channel,props in getPropGroupChannels(pb):
+            if len(props) == 0:
+                continue
+            indices = dict([(pg.index,True) for pg in props])
+            for fcu in getBoneFcurves(rig, pb, channel):
+                if fcu.array_index in indices.keys():
+                    if legacy:
+                        buildLegacyDriver(fcu, rig, pb, key)
+                    else:
+                        buildPropGroupDriver(fcu, rig, pb, key)
+                    nfcus += 1
+    return nfcus
+
 
 def addSelfRef(rig, pb):
     if pb.constraints:
@@ -125,10 +335,19 @@ def hasSelfRef(pb):
             pb.constraints[0].name == "Do Not Touch")
 
 
+def getPropGroupKey(pg):
+    return (pg.prop, pg.index)
+
+
+def getKeyItemKey(item):
+    return item.key
+
+
 def addPropGroup(rig, pb, idx, key, prop, value, default=0.0):
+    from .utils import addItem
     props = pb.DazLocProps if key == "Loc" else pb.DazRotProps if key == "Rot" else pb.DazScaleProps
     clearProp(props, prop, idx)
-    pg = props.add()
+    pg = addItem(props, (prop,idx), getPropGroupKey)
     pg.index = idx
     pg.prop = prop
     pg.factor = value
@@ -142,17 +361,16 @@ def removeFromPropGroup(props, prop):
 
 
 def clearProp(props, prop, idx):
-    for n,pg in enumerate(props):
-        if pg.prop == prop and pg.index == idx:
-            props.remove(n)
-            return
+    from .utils import removeItem
+    removeItem(props, (prop,idx), getPropGroupKey)
 
 
 def getNewItem(collProp, key):
-    for item in collProp:
-        if item.key == key:
-            return item
-    item = collProp.add()
+    from .utils import findItem, addItem
+    item = findItem(collProp, key, getKeyItemKey)
+    if item is not None:
+        return item
+    item = addItem(collProp, key, getKeyItemKey)
     item.key = key
     return item
 
@@ -220,8 +438,12 @@ from bpy.app.handlers import persistent
 
 @persistent
 def updateHandler(scn):
+    from .material import clearImageRegistry
+    from .utils import clearCollectionIndices
     global evalMorphs
     bpy.app.driver_namespace["evalMorphs"] = evalMorphs
+    clearImageRegistry()
+    clearCollectionIndices()
 
 
 classes = [
@@ -372,6 +594,16 @@ def initialize():
         description = "Merge shell materials with object material",
         default = True)
 
+    bpy.types.Scene.DazReuseMaterials = BoolProperty(
+        name = "Reuse Materials",
+        description = "Use the same Blender material for materials with identical channels and textures",
+        default = False)
+
+    bpy.types.Scene.DazDeferImages = BoolProperty(
+        name = "Defer Image Loading",
+        description = "Create images without reading them. Pixels are loaded when first drawn or rendered, or by Prewarm Images",
+        default = False)
+
     bpy.types.Scene.DazMaxBump = FloatProperty(
         name = "Max Bump Strength",
         description = "Max bump strength",
@@ -0,0 +1,340 @@
+# Copyright (c) 2016-2019, Thomas Larsson
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+import re
+import bpy
+from .error import *
+from .utils import *
+if bpy.app.version < (2,80,0):
+    from .buttons27 import ReportOnlyBool
+else:
+    from .buttons28 import ReportOnlyBool
+
+#-------------------------------------------------------------
+#   Driver dependency graph.
+#   Nodes are driven channels, keyed by (id pointer, data path).
+#   Sources are undriven rig properties (the sliders), DazFormulas
+#   and bone transforms. A driver is live if at least one of its
+#   inputs is a live source or the output of a live driver.
+#-------------------------------------------------------------
+
+LinearTerm = re.compile(r'([+-]?[0-9.]+)\*([mc]\d+)')
+
+class DriverGraph:
+
+    def __init__(self, rig):
+        from .benchmark import inventoryDrivers
+        self.rig = rig
+        self.rigptr = rig.as_pointer()
+        self.entries = inventoryDrivers(rig)
+        self.outputs = {}
+        for entry in self.entries:
+            self.addLegacyInputs(entry)
+            key = entry["key"]
+            if key not in self.outputs.keys():
+                self.outputs[key] = []
+            self.outputs[key].append(entry)
+        self.formulas = {}
+        for item in rig.DazFormulas:
+            self.formulas['["%s"]' % item.prop] = '["%s"]' % item.key
+        self.live = {}
+        self.computeLive()
+
+
+    def __repr__(self):
+        return ("<DriverGraph %s %d>" % (self.rig.name, len(self.entries)))
+
+
+    def addLegacyInputs(self, entry):
+        from .daz import LegacyExpr, getPropGroups
+        match = LegacyExpr.search(entry["expression"])
+        if match is None:
+            return
+        words = entry["path"].split('"')
+        if words[0] == "pose.bones[" and words[1] in self.rig.pose.bones.keys():
+            pb = self.rig.pose.bones[words[1]]
+            idx = int(match.group(1))
+            for pg in getPropGroups(pb, match.group(2)):
+                if pg.index == idx:
+                    entry["inputs"].append((self.rigptr, '["%s"]' % pg.prop))
+
+
+    def computeLive(self):
+        from .driver import isNumber
+        for entry in self.entries:
+            if entry["muted"]:
+                self.live[id(entry)] = True
+            elif not entry["inputs"] and not isNumber(entry["expression"].strip()):
+                # Expressions like frame are not constant
+                self.live[id(entry)] = True
+        changed = True
+        while changed:
+            changed = False
+            for entry in self.entries:
+                if id(entry) in self.live.keys():
+                    continue
+                for input in entry["inputs"]:
+                    if self.isLiveInput(input):
+                        self.live[id(entry)] = True
+                        changed = True
+                        break
+
+
+    def isLiveInput(self, input, depth=0):
+        ptr,path = input
+        if path[-1] == ".":
+            # Bone transforms are live even if the bone is driven
+            return True
+        if input in self.outputs.keys():
+            for entry in self.outputs[input]:
+                if id(entry) in self.live.keys():
+                    return True
+            return False
+        if ptr != self.rigptr:
+            return True
+        if path in self.formulas.keys() and depth < 10:
+            if self.isLiveInput((ptr, self.formulas[path]), depth+1):
+                return True
+        if path[0:2] == '["':
+            return (path[2:-2] in self.rig.keys())
+        try:
+            self.rig.path_resolve(path)
+            return True
+        except ValueError:
+            return False
+
+
+    def isLive(self, entry):
+        return (id(entry) in self.live.keys())
+
+#-------------------------------------------------------------
+#   Dead driver elimination
+#-------------------------------------------------------------
+
+def getDriverValue(entry):
+    rna = entry["rna"]
+    path = entry["path"]
+    try:
+        value = rna.path_resolve(path)
+    except ValueError:
+        return None
+    try:
+        return value[entry["index"]]
+    except TypeError:
+        return value
+
+
+def setDriverValue(entry, value):
+    rna = entry["rna"]
+    path = entry["path"]
+    if path[-1] == "]":
+        n = path.rfind("[")
+        struct = (rna.path_resolve(path[:n]) if n > 0 else rna)
+        struct[path[n+2:-2]] = value
+    else:
+        n = path.rfind(".")
+        struct = (rna.path_resolve(path[:n]) if n > 0 else rna)
+        attr = path[n+1:]
+        if isinstance(getattr(struct, attr), (int, float, bool)):
+            setattr(struct, attr, value)
+        else:
+            getattr(struct, attr)[entry["index"]] = value
+
+
+def removeZeroTerms(entry):
+    fcu = entry["fcurve"]
+    drv = fcu.driver
+    zeros = []
+    for factor,vname in LinearTerm.findall(drv.expression):
+        if abs(float(factor)) < 1e-6:
+            zeros.append((factor,vname))
+    if not zeros:
+        return 0
+    expr = drv.expression
+    for factor,vname in zeros:
+        expr = expr.replace("%s*%s" % (factor,vname), "", 1)
+        for var in drv.variables:
+            if var.name == vname:
+                drv.variables.remove(var)
+                break
+    expr = expr.replace("(+", "(").replace("()", "(0)")
+    drv.expression = expr
+    return len(zeros)
+
+
+def getTargetUsers():
+    # All driver targets in the file, also on objects outside the rig
+    from .driver import IdCollections
+    users = {}
+    for coll in IdCollections.values():
+        for rna in getattr(bpy.data, coll):
+            if rna.animation_data is None:
+                continue
+            rptr = rna.as_pointer()
+            for fcu in rna.animation_data.drivers:
+                owner = (rptr, fcu.data_path, fcu.array_index)
+                for var in fcu.driver.variables:
+                    for trg in var.targets:
+                        if trg.id:
+                            key = (trg.id.as_pointer(), trg.data_path)
+                            if key not in users.keys():
+                                users[key] = []
+                            users[key].append((owner, var, trg))
+    return users
+
+
+def getEntryOwner(entry):
+    return (entry["key"][0], entry["path"], entry["index"])
+
+
+def collapseIdentity(entry, removed, users):
+    drv = entry["fcurve"].driver
+    if (len(drv.variables) != 1 or
+        drv.variables[0].type != 'SINGLE_PROP' or
+        drv.expression.strip() != drv.variables[0].name or
+        entry["path"][-2:] != '"]'):
+        return False
+    source = drv.variables[0].targets[0]
+    if source.id is None:
+        return False
+    skip = [getEntryOwner(user) for user in removed.values()]
+    skip.append(getEntryOwner(entry))
+    targets = [(owner,var,trg) for owner,var,trg in users.get(entry["key"], [])
+               if owner not in skip]
+    if not targets:
+        return False
+    for owner,var,trg in targets:
+        if var.type != 'SINGLE_PROP':
+            return False
+    srckey = (source.id.as_pointer(), source.data_path)
+    if srckey not in users.keys():
+        users[srckey] = []
+    for owner,var,trg in targets:
+        trg.id = source.id
+        trg.data_path = source.data_path
+        users[srckey].append((owner,var,trg))
+    users[entry["key"]] = []
+    return True
+
+
+def pruneDrivers(rig, reportOnly=False):
+    from .driver import isNumber
+    graph = DriverGraph(rig)
+    report = {"constant" : [], "dead" : [], "zero_terms" : [], "collapsed" : []}
+    removed = {}
+    for entry in graph.entries:
+        if entry["muted"]:
+            continue
+        name = "%s %s[%d]" % (entry["owner"], entry["path"], entry["index"])
+        if not entry["inputs"] and isNumber(entry["expression"].strip()):
+            report["constant"].append(name)
+            removed[id(entry)] = entry
+        elif not graph.isLive(entry):
+            report["dead"].append(name)
+            removed[id(entry)] = entry
+
+    users = (None if reportOnly else getTargetUsers())
+    for entry in graph.entries:
+        if id(entry) in removed.keys() or entry["muted"]:
+            continue
+        name = "%s %s[%d]" % (entry["owner"], entry["path"], entry["index"])
+        if reportOnly:
+            nzeros = len([factor for factor,vname in LinearTerm.findall(entry["expression"]) if abs(float(factor)) < 1e-6])
+        else:
+            nzeros = removeZeroTerms(entry)
+        if nzeros:
+            report["zero_terms"].append("%s (%d)" % (name, nzeros))
+        if not reportOnly and collapseIdentity(entry, removed, users):
+            report["collapsed"].append(name)
+            removed[id(entry)] = entry
+
+    if not reportOnly:
+        for entry in removed.values():
+            value = getDriverValue(entry)
+            entry["rna"].driver_remove(entry["path"], entry["index"])
+            if value is not None:
+                try:
+                    setDriverValue(entry, value)
+                except (ValueError, KeyError, AttributeError, TypeError):
+                    pass
+    return report
+
+
+def printDriverReport(report, reportOnly):
+    verb = ("Would remove" if reportOnly else "Removed")
+    print("%s %d constant and %d dead drivers" % (verb, len(report["constant"]), len(report["dead"])))
+    print("%d drivers with zero terms, %d identity drivers collapsed" % (len(report["zero_terms"]), len(report["collapsed"])))
+    if theSettings.verbosity > 1:
+        for key in ["constant", "dead", "zero_terms", "collapsed"]:
+            for name in report[key]:
+                print("  %s: %s" % (key, name))
+
+
+class DAZ_OT_RemoveDeadDrivers(bpy.types.Operator, ReportOnlyBool):
+    bl_idname = "daz.remove_dead_drivers"
+    bl_label = "Remove Dead Drivers"
+    bl_description = "Remove drivers of the active rig and its meshes that are constant or not reachable from any slider"
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'ARMATURE')
+
+    def draw(self, context):
+        self.layout.prop(self, "reportOnly")
+
+    def execute(self, context):
+        try:
+            rig = context.object
+            report = pruneDrivers(rig, self.reportOnly)
+            printDriverReport(report, self.reportOnly)
+            if not self.reportOnly:
+                updateDrivers(rig)
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_props_dialog(self)
+        return {'RUNNING_MODAL'}
+
+#----------------------------------------------------------
+#   Initialize
+#----------------------------------------------------------
+
+classes = [
+    DAZ_OT_RemoveDeadDrivers,
+]
+
+def initialize():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+
+def uninitialize():
+    for cls in classes:
+        bpy.utils.unregister_class(cls)
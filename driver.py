@@ -182,7 +182,7 @@ def makeDriverString(vec):
                     string += ("%d*%s" % (x, comp))
             nonzero = True
     if nonzero:
-        return (string + ")*1e-3")
+        return (string + ")/1000")
     else:
         return ""
 
@@ -204,28 +204,29 @@ def makeProductBoneDriver(vecs, rna, channel, rig, bname, idx):
 
 
 def makeSplineBoneDriver(uvec, points, rna, channel, rig, bname, idx):
-    n = len(points)
-    xi,yi = points[0]
-    string = "[%s if x< %s" % (getPrint(yi), getPrint(xi))
-    for i in range(1, n):
-        xj,yj = points[i]
-        kij = (yj-yi)/(xj-xi)
-        zs,zi = getSign(yi - kij*xi)
-        string += (" else %s*x%s%s if x< %s " %
-            (getPrint(kij), zs, getPrint(zi), getPrint(xj)))
-        xi,yi = xj,yj
-    string += " else %s for x in [" % getPrint(yj)
+    # The driver computes the spline parameter as a simple expression,
+    # and the spline itself is the driver F-curve: linear keyframes
+    # with constant extrapolation. No Python is involved.
+    string = ""
     for i,comp in enumerate(["A","B","C"]):
-        us,ui = getSign(uvec[i])
-        string += "%s%s*%s" % (us, getPrint(ui), comp)
-    string += "]][0]     "
-    if len(string) > 254:
-        msg = "String driver too long:\n"
-        for n in range(5):
-            msg += "%s         \n" % (string[30*n, 30*(n+1)])
-        raise DazError(msg)
-
-    makeBoneDriver(string, rna, channel, rig, bname, idx)
+        if abs(uvec[i]) > 1e-6:
+            us,ui = getSign(uvec[i])
+            string += "%s%s*%s" % (us, getPrint(ui), comp)
+    if not string:
+        string = "0"
+    elif string[0] == "+":
+        string = string[1:]
+    makeBoneDriver(string, rna, channel, rig, bname, idx, points)
+
+
+def setSplinePoints(fcu, points):
+    for fmod in list(fcu.modifiers):
+        fcu.modifiers.remove(fmod)
+    fcu.keyframe_points.add(len(points))
+    for kp,xy in zip(fcu.keyframe_points, points):
+        kp.co = xy
+        kp.interpolation = 'LINEAR'
+    fcu.extrapolation = 'CONSTANT'
 
 
 def getPrint(x):
@@ -242,13 +243,22 @@ def getSign(u):
         return "+", u
 
 
-def makeBoneDriver(string, rna, channel, rig, bname, idx):
+def makeBoneDriver(string, rna, channel, rig, bname, idx, points=None):
+    if theDriverBatch and not isinstance(rna, bpy.types.PoseBone):
+        vars = [("TRANSFORMS", vname, rig, (bname, ttype))
+                for vname,ttype in [("A","ROT_X"), ("B","ROT_Y"), ("C","ROT_Z")]
+                if vname in string]
+        theDriverBatch.add(rna, channel, idx, string, vars, points)
+        return None
     rna.driver_remove(channel, idx)
     fcu = rna.driver_add(channel, idx)
     fcu.driver.type = 'SCRIPTED'
     fcu.driver.expression = string
     for vname,ttype in [("A","ROT_X"), ("B","ROT_Y"), ("C","ROT_Z")]:
-        addTransformVar(fcu, vname, ttype, rig, bname)
+        if vname in string:
+            addTransformVar(fcu, vname, ttype, rig, bname)
+    if points:
+        setSplinePoints(fcu, points)
     return fcu
 
 
@@ -288,26 +298,149 @@ def copyDriver(fcu1, rna2, id=None):
     if (words[0] == "pose.bones[" and
         hasattr(rna2, "pose")):
         rna2 = rna2.pose.bones[words[1]]
-    fcu2 = rna2.driver_add(channel, idx)
-    fcu2.driver.type = fcu1.driver.type
-    if hasattr(fcu1.driver, "use_self"):
-        fcu2.driver.use_self = fcu1.driver.use_self
-    fcu2.driver.expression = fcu1.driver.expression
-    for var1 in fcu1.driver.variables:
-        var2 = fcu2.driver.variables.new()
-        var2.type = var1.type
-        var2.name = var1.name
-        trg1 = var1.targets[0]
-        trg2 = var2.targets[0]
-        if id:
-            trg2.id = id
-        else:
-            trg2.id = trg1.id
-        trg2.bone_target = trg1.bone_target
-        trg2.data_path = trg1.data_path
-        trg2.transform_type = trg1.transform_type
-        trg2.transform_space = trg1.transform_space
-    return fcu2
+    entry = snapshotDriver(fcu1)
+    entry["array"] = (idx >= 0)
+    return restoreDriver(rna2, channel, entry, id=id)
+
+#-------------------------------------------------------------
+#   Driver snapshots.
+#   A snapshot is a list of plain dicts, one per driver F-curve,
+#   that can be stored as json. Restoring a snapshot onto another
+#   ID creates all drivers in one pass, with the variable targets
+#   remapped through id or idmap.
+#-------------------------------------------------------------
+
+IdCollections = {
+    "OBJECT" : "objects",
+    "MESH" : "meshes",
+    "ARMATURE" : "armatures",
+    "KEY" : "shape_keys",
+    "MATERIAL" : "materials",
+    "SCENE" : "scenes",
+}
+
+def snapshotDriver(fcu, owner=None):
+    drv = fcu.driver
+    vars = []
+    for var in drv.variables:
+        trgs = []
+        for trg in var.targets:
+            trgs.append({
+                "id" : (trg.id.name if trg.id else None),
+                "id_type" : trg.id_type,
+                "data_path" : trg.data_path,
+                "bone_target" : trg.bone_target,
+                "transform_type" : trg.transform_type,
+                "transform_space" : trg.transform_space,
+            })
+        vars.append({"name" : var.name, "type" : var.type, "targets" : trgs})
+    if owner:
+        try:
+            array = isVector(owner.path_resolve(fcu.data_path))
+        except ValueError:
+            array = (fcu.array_index > 0)
+    else:
+        array = (fcu.array_index > 0)
+    return {
+        "path" : fcu.data_path,
+        "index" : fcu.array_index,
+        "array" : array,
+        "type" : drv.type,
+        "expression" : drv.expression,
+        "use_self" : getattr(drv, "use_self", False),
+        "variables" : vars,
+        "keyframes" : [tuple(kp.co) for kp in fcu.keyframe_points],
+        "extrapolation" : fcu.extrapolation,
+    }
+
+
+def snapshotDrivers(rna, filter=None):
+    snapshot = []
+    if rna and rna.animation_data:
+        for fcu in rna.animation_data.drivers:
+            if filter is None or filter(fcu):
+                snapshot.append(snapshotDriver(fcu, rna))
+    return snapshot
+
+
+def getTargetId(struct, id, idmap):
+    if id:
+        return id
+    name = struct["id"]
+    if name is None:
+        return None
+    elif name in idmap.keys():
+        return idmap[name]
+    coll = IdCollections.get(struct["id_type"])
+    if coll:
+        return getattr(bpy.data, coll).get(name)
+    return None
+
+
+def restoreDriver(rna, path, entry, id=None, idmap={}):
+    if entry["array"]:
+        fcu = rna.driver_add(path, entry["index"])
+    else:
+        fcu = rna.driver_add(path)
+    drv = fcu.driver
+    drv.type = entry["type"]
+    if hasattr(drv, "use_self"):
+        drv.use_self = entry["use_self"]
+    drv.expression = entry["expression"]
+    for vstruct in entry["variables"]:
+        var = drv.variables.new()
+        var.type = vstruct["type"]
+        var.name = vstruct["name"]
+        for trg,tstruct in zip(var.targets, vstruct["targets"]):
+            if var.type == 'SINGLE_PROP':
+                trg.id_type = tstruct["id_type"]
+            trg.id = getTargetId(tstruct, id, idmap)
+            trg.bone_target = tstruct["bone_target"]
+            trg.data_path = tstruct["data_path"]
+            trg.transform_type = tstruct["transform_type"]
+            trg.transform_space = tstruct["transform_space"]
+    if entry["keyframes"]:
+        setSplinePoints(fcu, entry["keyframes"])
+        fcu.extrapolation = entry["extrapolation"]
+    return fcu
+
+
+def restoreDrivers(rna, snapshot, id=None, idmap={}, replace=True):
+    index = DriverIndex(rna)
+    fcus = []
+    for entry in snapshot:
+        old = index.get(entry["path"], entry["index"])
+        if old:
+            if not replace:
+                continue
+            elif entry["array"]:
+                rna.driver_remove(entry["path"], entry["index"])
+            else:
+                rna.driver_remove(entry["path"])
+        fcus.append(restoreDriver(rna, entry["path"], entry, id, idmap))
+    return fcus
+
+
+class DriverIndex:
+    def __init__(self, rna):
+        self.fcurves = {}
+        if rna and rna.animation_data:
+            for fcu in rna.animation_data.drivers:
+                self.fcurves[(fcu.data_path, fcu.array_index)] = fcu
+
+
+    def get(self, path, idx=0, type=None):
+        fcu = self.fcurves.get((path, idx))
+        if fcu is None or type is None:
+            return fcu
+        for var in fcu.driver.variables:
+            if var.type == type:
+                return fcu
+        return None
+
+
+    def getShapekeyDriver(self, sname, type=None):
+        return self.get('key_blocks["%s"].value' % sname, 0, type)
 
 
 def changeDriverTarget(fcu, id):
@@ -328,6 +461,9 @@ def removeDriverBoneSuffix(fcu, suffix):
 #-------------------------------------------------------------
 
 def makePropDriver(prop, rna, channel, rig, expr, idx=-1):
+    if theDriverBatch:
+        theDriverBatch.add(rna, channel, idx, expr, [("SINGLE_PROP", "x", rig, prop)])
+        return
     rna.driver_remove(channel, idx)
     fcu = rna.driver_add(channel, idx)
     fcu.driver.type = 'SCRIPTED'
@@ -339,6 +475,9 @@ def makeShapekeyDriver(ob, sname, value, rig, prop, min=None, max=None):
     setFloatProp(rig, prop, value, min=min, max=max)
     setBoolProp(rig, "DzA"+prop, True)
     skey = ob.data.shape_keys.key_blocks[sname]
+    if theDriverBatch:
+        theDriverBatch.add(skey, "value", -1, "x", [("SINGLE_PROP", "x", rig, prop)])
+        return
     if getShapekeyDriver(ob.data.shape_keys, sname):
         skey.driver_remove("value")
     fcu = skey.driver_add("value")
@@ -377,6 +516,95 @@ def setBoolProp(ob, prop, value, desc=""):
 #   
 #-------------------------------------------------------------
 
+#-------------------------------------------------------------
+#   Driver batches.
+#   While a batch is active, new shapekey and property drivers are
+#   queued instead of created. Committing the batch creates all
+#   drivers in one pass and updates the dependency graph once.
+#   Pose bone drivers are not queued, since prop group drivers
+#   may be added to the same channels in the meantime. Specs are
+#   keyed by owner ID and full data path, and resolved at commit,
+#   since shapekeys may be replaced before the batch is committed.
+#-------------------------------------------------------------
+
+theDriverBatch = None
+
+class DriverBatch:
+    def __init__(self):
+        self.specs = {}
+
+
+    def add(self, rna, channel, idx, expr, vars, points=None):
+        id = rna.id_data
+        path = getFullPath(rna, channel)
+        key = (id.as_pointer(), path, idx)
+        if key in self.specs.keys():
+            del self.specs[key]
+        self.specs[key] = (id, path, idx, expr, vars, points)
+
+
+    def commit(self, context):
+        import time
+        t1 = time.clock()
+        owners = {}
+        for rna,channel,idx,expr,vars,points in self.specs.values():
+            try:
+                rna.path_resolve(channel)
+            except ValueError:
+                print("Driven channel %s disappeared" % channel)
+                continue
+            rna.driver_remove(channel, idx)
+            fcu = rna.driver_add(channel, idx)
+            fcu.driver.type = 'SCRIPTED'
+            fcu.driver.expression = expr
+            for type,vname,rig,data in vars:
+                if type == "SINGLE_PROP":
+                    addDriverVar(fcu, vname, data, rig)
+                else:
+                    bname,ttype = data
+                    addTransformVar(fcu, vname, ttype, rig, bname)
+            if points:
+                setSplinePoints(fcu, points)
+            owners[rna.id_data.as_pointer()] = rna.id_data
+        for id in owners.values():
+            updateDrivers(id)
+        if context and self.specs:
+            updateScene(context, True)
+        if theSettings.verbosity > 1 and self.specs:
+            t2 = time.clock()
+            print("%d drivers created in %.3f seconds" % (len(self.specs), t2-t1))
+        self.specs = {}
+
+
+def beginDriverBatch():
+    global theDriverBatch
+    if theDriverBatch is None:
+        theDriverBatch = DriverBatch()
+        return True
+    return False
+
+
+def endDriverBatch(context, owner):
+    global theDriverBatch
+    if owner and theDriverBatch:
+        batch = theDriverBatch
+        theDriverBatch = None
+        batch.commit(context)
+
+
+def getFullPath(rna, channel):
+    if rna == rna.id_data:
+        return channel
+    base = rna.path_from_id()
+    if channel[0] == "[":
+        return base + channel
+    else:
+        return "%s.%s" % (base, channel)
+
+#-------------------------------------------------------------
+#
+#-------------------------------------------------------------
+
 def addDriverVar(fcu, vname, dname, rig):
     var = fcu.driver.variables.new()
     var.name = vname
@@ -439,12 +667,16 @@ def getShapekeyDrivers(ob, drivers={}):
 
 def copyShapeKeyDrivers(ob, drivers):
     skeys = ob.data.shape_keys
+    if skeys is None:
+        return
+    index = DriverIndex(skeys)
+    snapshot = []
     for sname,fcu in drivers.items():
-        if (getShapekeyDriver(skeys, sname) or
+        if (index.getShapekeyDriver(sname) or
             sname not in skeys.key_blocks.keys()):
             continue
-        skey = skeys.key_blocks[sname]
-        copyDriver(fcu, skey)
+        snapshot.append(snapshotDriver(fcu))
+    restoreDrivers(skeys, snapshot)
 
 
 def hasSuchTarget(fcu, prefix):
@@ -518,14 +750,19 @@ def removeDriverFCurves(fcus, rig):
     
 
 def removeRigDrivers(rig):
+    from .daz import isPropGroupDriver
     if rig.animation_data is None:
         return
     fcus = []
     for fcu in rig.animation_data.drivers:
-        if ("evalMorphs" in fcu.driver.expression or
+        if (isPropGroupDriver(fcu) or
             isNumber(fcu.driver.expression)):
             fcus.append(fcu)
     removeDriverFCurves(fcus, rig)
+    for pb in rig.pose.bones:
+        for prop in list(pb.keys()):
+            if prop[0:6] == "DazSum":
+                del pb[prop]
 
 
 def removePropDrivers(rna, path, rig):
@@ -749,30 +986,57 @@ class DAZ_OT_CopyProps(bpy.types.Operator):
             handleDazError(context)
         return {'FINISHED'}
 
+#----------------------------------------------------------
+#   Update morph drivers
+#----------------------------------------------------------
+
+class DAZ_OT_UpdateMorphDrivers(bpy.types.Operator):
+    bl_idname = "daz.update_morph_drivers"
+    bl_label = "Update Morph Drivers"
+    bl_description = "Replace evalMorphs drivers from older files with simple expression drivers"
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'ARMATURE')
+
+    def execute(self, context):
+        from .daz import rebuildPropGroupDrivers
+        try:
+            rig = context.object
+            nfcus = rebuildPropGroupDrivers(rig)
+            updateDrivers(rig)
+            print("%d drivers updated" % nfcus)
+        except DazError:
+            handleDazError(context)
+        return {'FINISHED'}
+
 #----------------------------------------------------------
 #   Copy drivers
 #----------------------------------------------------------
 
 def copyBoneDrivers(rig1, rig2):
-    from .daz import hasSelfRef, copyPropGroups
+    from .daz import hasSelfRef, copyPropGroups, rebuildPropGroupDrivers
 
     if rig1.animation_data:
-        struct = {}
-        for fcu in rig1.animation_data.drivers:
+        def isBoneDriver(fcu):
             words = fcu.data_path.split('"')
             if (len(words) == 3 and
                 words[0] == "pose.bones["):
-                bname = words[1]
-                if bname not in rig2.data.bones.keys():
-                    print("Missing bone:", bname)
-                    continue
-                copyDriver(fcu, rig2, id=rig2)
+                if words[1] in rig2.data.bones.keys():
+                    return True
+                print("Missing bone:", words[1])
+            return False
+
+        snapshot = snapshotDrivers(rig1, isBoneDriver)
+        restoreDrivers(rig2, snapshot, id=rig2, replace=False)
 
         for pb1 in rig1.pose.bones:
             if (pb1.name in rig2.pose.bones.keys() and
                 hasSelfRef(pb1)):
                 pb2 = rig2.pose.bones[pb1.name]
                 copyPropGroups(rig1, rig2, pb2)
+        rebuildPropGroupDrivers(rig2)
 
 
 class DAZ_OT_CopyBoneDrivers(bpy.types.Operator):
@@ -806,6 +1070,7 @@ classes = [
     DAZ_OT_RemoveUnusedDrivers,
     DAZ_OT_RetargetDrivers,
     DAZ_OT_CopyProps,
+    DAZ_OT_UpdateMorphDrivers,
     DAZ_OT_CopyBoneDrivers,
     DAZ_OT_UpdateAll,
 ]
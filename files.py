@@ -149,6 +149,14 @@ class FileAsset(Asset):
                     self.modifiers.append((asset,inst))
                     asset.addModifier(inst)
 
+            if theSettings.useModifiers and "animations" in scene.keys():
+                from .modifier import addAnimatedMorph
+                for astruct in scene["animations"]:
+                    if ("url" in astruct.keys() and
+                        "keys" in astruct.keys() and
+                        len(astruct["keys"]) > 1):
+                        addAnimatedMorph(astruct["url"])
+
             if theSettings.useMaterials and "extra" in scene.keys():
                 for estruct in scene["extra"]:
                     if "render_options" in estruct.keys():
@@ -132,22 +132,24 @@ def fixKnees(rig, knees):
 
 
 def fixCorrectives(rig, assoc):
-    from .driver import getShapekeyDriver, replaceDriverBone
+    from .driver import DriverIndex, replaceDriverBone
     for ob in rig.children:
         if ob.type == 'MESH' and ob.data.shape_keys:
             skeys = ob.data.shape_keys
+            index = DriverIndex(skeys)
             for skey in skeys.key_blocks[1:]:
-                if getShapekeyDriver(skeys, skey.name):
+                if index.getShapekeyDriver(skey.name):
                     replaceDriverBone(assoc, skeys, 'key_blocks["%s"].value' % (skey.name))
 
 
 def checkCorrectives(rig):
-    from .driver import getShapekeyDriver, checkDriverBone
+    from .driver import DriverIndex, checkDriverBone
     for ob in rig.children:
         if ob.type == 'MESH' and ob.data.shape_keys:
             skeys = ob.data.shape_keys
+            index = DriverIndex(skeys)
             for skey in skeys.key_blocks[1:]:
-                if getShapekeyDriver(skeys, skey.name):
+                if index.getShapekeyDriver(skey.name):
                     checkDriverBone(rig, skeys, 'key_blocks["%s"].value' % (skey.name))
 
 
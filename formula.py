@@ -44,12 +44,27 @@ class Formula:
     def __init__(self):
         self.formulas = []
         self.built = False
+        self.program = None
+
+
+    def getProgram(self):
+        if self.program is None:
+            self.program = []
+            for formula in self.formulas:
+                compiled = compileFormula(formula)
+                if compiled:
+                    self.program.append(compiled)
+        return self.program
 
 
     def parse(self, struct):
+        from .modifier import addFormulaTarget
         if (theSettings.useFormulas and
             "formulas" in struct.keys()):
             self.formulas = struct["formulas"]
+            for formula in self.formulas:
+                if "output" in formula.keys():
+                    addFormulaTarget(formula["output"])
 
 
     def prebuild(self, context, inst):
@@ -245,9 +260,7 @@ class Formula:
             exprlist = []
             proplist = []
             for asset,bone,channel in stages:
-                exprs1 = {}
-                props1 = {}
-                asset.evalFormulas(exprs1, props1, rig, mesh, useBone)
+                exprs1,props1 = evalStage(asset, rig, mesh, useBone)
                 if exprs1:
                     expr1 = list(exprs1.values())[0]
                     exprlist.append(expr1)
@@ -278,6 +291,213 @@ def getRefKey(string):
     base = string.split(":",1)[-1]
     return base.rsplit("?",1)
 
+#-------------------------------------------------------------
+#   Stage memo
+#   Stage assets such as the ERC controllers in Genesis 3/8 are
+#   pushed by many formulas. Evaluate each one once per load and
+#   hand out copies, since multiplyStages modifies them in place.
+#-------------------------------------------------------------
+
+theStageMemo = {}
+theStageStats = {"hits" : 0, "misses" : 0}
+
+def clearStageMemo():
+    global theStageMemo
+    theStageMemo = {}
+    theStageStats["hits"] = 0
+    theStageStats["misses"] = 0
+
+
+def evalStage(asset, rig, mesh, useBone):
+    from copy import deepcopy
+    key = (asset.id, rig.name, (mesh.name if mesh else None), useBone)
+    if key in theStageMemo.keys():
+        theStageStats["hits"] += 1
+    else:
+        theStageStats["misses"] += 1
+        exprs = {}
+        props = {}
+        asset.evalFormulas(exprs, props, rig, mesh, useBone)
+        theStageMemo[key] = (exprs, props)
+    exprs,props = theStageMemo[key]
+    return deepcopy(exprs), dict(props)
+
+
+def reportStageStats():
+    if theStageStats["hits"]:
+        print("Reused %d of %d stage evaluations" %
+              (theStageStats["hits"], theStageStats["hits"]+theStageStats["misses"]))
+
+#-------------------------------------------------------------
+#   Formula compiler
+#   Turns the operations of a formula into a closure that takes
+#   a dict of input values (floats or numpy arrays) keyed by
+#   "name?channel", e.g. "CTRLSmile?value" or "lShldrBend?rotation/x".
+#-------------------------------------------------------------
+
+def getFormulaKey(url):
+    return url.split("#")[-1].replace("%20", " ")
+
+
+def compileFormula(formula):
+    if "output" not in formula.keys() or "operations" not in formula.keys():
+        return None
+    output = getFormulaKey(formula["output"])
+    stage = formula["stage"] if "stage" in formula.keys() else "sum"
+    ops = formula["operations"]
+    inputs = []
+    if (len(ops) > 3 and
+        ops[-1]["op"] in ["spline_tcb", "spline_linear"] and
+        "url" in ops[0].keys()):
+        key = getFormulaKey(ops[0]["url"])
+        inputs.append(key)
+        points = [ops[n]["val"] for n in range(1,len(ops)-2)]
+        func = compileSpline(compileInput(key), points)
+        return output, stage, inputs, func
+
+    stack = []
+    for struct in ops:
+        op = struct["op"]
+        if op == "push":
+            if "url" in struct.keys():
+                key = getFormulaKey(struct["url"])
+                inputs.append(key)
+                stack.append(compileInput(key))
+            elif "val" in struct.keys():
+                stack.append(compileConst(struct["val"]))
+            else:
+                return None
+        elif op in FormulaOps.keys() and len(stack) >= 2:
+            y = stack.pop()
+            x = stack.pop()
+            stack.append(compileBinary(FormulaOps[op], x, y))
+        else:
+            return None
+    if len(stack) != 1:
+        return None
+    return output, stage, inputs, stack[0]
+
+
+def compileInput(key):
+    def func(values):
+        return values.get(key, 0.0)
+    return func
+
+
+def compileConst(value):
+    def func(values):
+        return value
+    return func
+
+
+def compileBinary(op, x, y):
+    def func(values):
+        return op(x(values), y(values))
+    return func
+
+
+def compileSpline(x, points):
+    import numpy as np
+    points = [(p[0],p[1]) for p in points]
+    points.sort()
+    xs = np.array([p[0] for p in points])
+    ys = np.array([p[1] for p in points])
+    def func(values):
+        return np.interp(x(values), xs, ys)
+    return func
+
+
+def divideSafe(x, y):
+    import numpy as np
+    if np.isscalar(y):
+        return (x/y if y != 0 else 0.0)
+    return np.where(y != 0, x/np.where(y != 0, y, 1), 0.0)
+
+
+FormulaOps = {
+    "mult" : lambda x,y: x*y,
+    "add" : lambda x,y: x+y,
+    "sub" : lambda x,y: x-y,
+    "div" : divideSafe,
+}
+
+#-------------------------------------------------------------
+#   Offline formula network.
+#   Evaluates all outputs of a set of formula assets for given
+#   slider values, without touching Blender data.
+#-------------------------------------------------------------
+
+class FormulaNetwork:
+
+    def __init__(self, assets=[]):
+        self.terms = {}
+        self.order = None
+        for asset in assets:
+            self.addAsset(asset)
+
+
+    def __repr__(self):
+        return ("<FormulaNetwork %d>" % len(self.terms))
+
+
+    def addAsset(self, asset):
+        for output,stage,inputs,func in asset.getProgram():
+            if output not in self.terms.keys():
+                self.terms[output] = []
+            self.terms[output].append((stage, inputs, func))
+        self.order = None
+
+
+    def getOrder(self):
+        if self.order is not None:
+            return self.order
+        deps = {}
+        users = {}
+        for output,terms in self.terms.items():
+            deps[output] = {}
+            for stage,inputs,func in terms:
+                for key in inputs:
+                    if key in self.terms.keys() and key != output:
+                        deps[output][key] = True
+        for output,dep in deps.items():
+            for key in dep.keys():
+                if key not in users.keys():
+                    users[key] = []
+                users[key].append(output)
+        counts = dict([(output,len(dep)) for output,dep in deps.items()])
+        queue = [output for output,count in counts.items() if count == 0]
+        self.order = []
+        while queue:
+            output = queue.pop()
+            self.order.append(output)
+            if output in users.keys():
+                for user in users[output]:
+                    counts[user] -= 1
+                    if counts[user] == 0:
+                        queue.append(user)
+        if len(self.order) < len(self.terms):
+            cyclic = [output for output in self.terms.keys() if counts[output] > 0]
+            if theSettings.verbosity > 1:
+                print("Dependency loop in formulas:", cyclic)
+            self.order += cyclic
+        return self.order
+
+
+    def evaluate(self, values):
+        result = dict(values)
+        for output in self.getOrder():
+            value = values.get(output, 0.0)
+            factor = None
+            for stage,inputs,func in self.terms[output]:
+                if stage == "mult":
+                    factor = (func(result) if factor is None else factor*func(result))
+                else:
+                    value = value + func(result)
+            if factor is not None:
+                value = value*factor
+            result[output] = value
+        return result
+
 
 #-------------------------------------------------------------
 #   Build bone formula
@@ -510,36 +730,40 @@ def buildPropFormula(asset, scn, rig, type, prefix, errors):
         return []
 
 
+def getFormulaItemKey(item):
+    return (item.key, item.prop)
+
+
+def getStringItemKey(item):
+    return item.s
+
+
 def getNewFormula(rig, key, prop):
-    for item in rig.DazFormulas:
-        if (item.key == key and
-            item.prop == prop):
-            return item
-    item = rig.DazFormulas.add()
+    from .utils import findItem, addItem
+    item = findItem(rig.DazFormulas, (key,prop), getFormulaItemKey)
+    if item is not None:
+        return item
+    item = addItem(rig.DazFormulas, (key,prop), getFormulaItemKey)
     item.key = key
     item.prop = prop
     return item
 
 
 def getOldFormula(rig, key, prop):
-    for item in rig.DazFormulas:
-        if (item.key == key and
-            item.prop == prop):
-            return item
-    return None
+    from .utils import findItem
+    return findItem(rig.DazFormulas, (key,prop), getFormulaItemKey)
 
 
 def inStringGroup(items, string):
-    for item in items:
-        if item.s == string:
-            return True
-    return False
+    from .utils import findItem
+    return (findItem(items, string, getStringItemKey) is not None)
 
 
 def addToStringGroup(items, string):
+    from .utils import addItem
     if inStringGroup(items, string):
         return
-    item = items.add()
+    item = addItem(items, string, getStringItemKey)
     item.s = string
 
 
@@ -35,6 +35,8 @@ from .settings import theSettings
 
 class InternalMaterial(Material, FromInternal):
 
+    useSharing = True
+
     def __repr__(self):
         return ("<Internal %s r: %s>" % (self.id, self.rna))
 
@@ -50,6 +52,8 @@ class InternalMaterial(Material, FromInternal):
         if self.ignore:
             return
         Material.build(self, context)
+        if self.shared:
+            return
         scn = context.scene
         mat = self.rna
         mat.specular_intensity = 0.05
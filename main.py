@@ -196,9 +196,15 @@ def addToGroup(inst, grp):
 def finishMain(filepath, t1):
     import time
     from .asset import clearAssets
+    from .modifier import reportMorphStats
+    from .formula import reportStageStats
+    from .material import reportImageStats
 
     t2 = time.clock()
     print("File %s loaded in %.3f seconds" % (filepath, t2-t1))
+    reportMorphStats()
+    reportStageStats()
+    reportImageStats()
     clearAssets()
 
 #------------------------------------------------------------------
@@ -38,9 +38,9 @@ from .settings import theSettings
 from .error import *
 from mathutils import Vector, Matrix
 if bpy.app.version < (2,80,0):
-    from .buttons27 import SlotString, UseInternalBool, ImageFile, DazImageFile, MultiFile, ResizeOptions, DazChannelFactor
+    from .buttons27 import SlotString, UseInternalBool, ImageFile, DazImageFile, MultiFile, ResizeOptions, PlannerOptions, DazChannelFactor
 else:
-    from .buttons28 import SlotString, UseInternalBool, ImageFile, DazImageFile, MultiFile, ResizeOptions, DazChannelFactor
+    from .buttons28 import SlotString, UseInternalBool, ImageFile, DazImageFile, MultiFile, ResizeOptions, PlannerOptions, DazChannelFactor
 
 WHITE = Vector((1.0,1.0,1.0))
 GREY = Vector((0.5,0.5,0.5))
@@ -62,11 +62,36 @@ def getMatKey(id):
         return key
 
 
+ChannelAccessors = [
+    "getChannelDiffuse", "getChannelDiffuseStrength", "getChannelDiffuseRoughness",
+    "getChannelSpecularColor", "getChannelSpecularStrength",
+    "getChannelGlossyReflectivity", "getChannelGlossyRoughness",
+    "getChannelGlossySpecular", "getChannelGlossiness",
+    "getChannelTranslucencyColor", "getChannelTranslucencyWeight",
+    "getChannelOpacity", "getChannelCutoutOpacity",
+    "getChannelAmbientColor", "getChannelAmbientStrength", "getChannelEmissionColor",
+    "getChannelReflectionColor", "getChannelReflectionStrength",
+    "getChannelRefractionColor", "getChannelRefractionStrength", "getChannelIOR",
+    "getChannelSSSColor", "getChannelSSSAmount", "getChannelSSSScale",
+    "getChannelSSSRadius", "getChannelSSSIOR", "getChannelTopCoatRoughness",
+    "getChannelNormal", "getChannelBump", "getChannelBumpMin", "getChannelBumpMax",
+    "getChannelDisplacement", "getChannelDispMin", "getChannelDispMax",
+    "getChannelHorizontalTiles", "getChannelHorizontalOffset",
+    "getChannelVerticalTiles", "getChannelVerticalOffset",
+]
+
+
 class Material(Asset):
 
+    useSharing = False
+    useResolution = True
+
     def __init__(self, fileref):
         Asset.__init__(self, fileref)
         self.scene = None
+        self.signature = None
+        self.shared = False
+        self.resolution = None
         self.shader = 'DAZ'
         self.channels = OrderedDict()
         self.studioChannels = OrderedDict()
@@ -176,6 +201,7 @@ class Material(Asset):
 
 
     def replaceChannel(self, key, data):
+        self.resolution = None
         if key in self.channels.keys():
             channel = self.channels[key]
             for name,value in data.items():
@@ -185,6 +211,7 @@ class Material(Asset):
 
 
     def copyChannels(self, base):
+        self.resolution = None
         for key,value in base.channels.items():
             if key not in self.channels.keys():
                 self.channels[key] = value.copy()
@@ -195,14 +222,8 @@ class Material(Asset):
         from .geometry import Geometry
         if self.ignore:
             return
-        if self.rna is None:
-            self.rna = bpy.data.materials.new(self.name)
         scn = self.scene = context.scene
-        mat = self.rna
-        mat.DazRenderEngine = scn.render.engine
-        mat.DazShader = self.shader
-        if bpy.app.version < (2,80,0):
-            mat.game_settings.alpha_blend = 'CLIP'
+        self.resolveChannels()
         if self.uv_set:
             self.uv_sets[self.uv_set.name] = self.uv_set
         geo = self.geometry
@@ -212,10 +233,44 @@ class Material(Asset):
                     self.uv_sets[uv] = self.uv_sets[uvset.name] = uvset
         for shell,uvs in self.shells:
             shell.shader = self.shader
+        if self.rna is None:
+            if self.useSharing and theSettings.reuseMaterials:
+                self.signature = self.getSignature(scn)
+                mat = findSharedMaterial(self.signature)
+                if mat:
+                    self.rna = mat
+                    self.shared = True
+                    return
+            self.rna = bpy.data.materials.new(self.name)
+            registerMaterial(self.rna, self.signature)
+        mat = self.rna
+        mat.DazRenderEngine = scn.render.engine
+        mat.DazShader = self.shader
+        if bpy.app.version < (2,80,0):
+            mat.game_settings.alpha_blend = 'CLIP'
         if self.thinGlass:
             mat.DazThinGlass = True
 
 
+    def getSignature(self, scn):
+        import hashlib
+        import json
+        if self.shells or self.geosockets or self.hideMaterial:
+            return None
+        data = {
+            "class" : self.__class__.__name__,
+            "shader" : self.shader,
+            "engine" : scn.render.engine,
+            "settings" : [getattr(theSettings, attr) for attr in SignatureSettings],
+            "scene" : [getattr(scn, attr, None) for attr in SignatureSceneProps],
+            "channels" : self.channels,
+            "uv_set" : (self.uv_set.name if self.uv_set else None),
+            "uv_sets" : sorted([(key, uvset.name) for key,uvset in self.uv_sets.items()]),
+        }
+        string = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.md5(string.encode("utf-8")).hexdigest()
+
+
     def postbuild(self, context):
         pass
 
@@ -244,12 +299,35 @@ class Material(Asset):
 
 
     def fixUdim(self, udim):
+        if self.rna.name in theUdimClaims.keys():
+            claim,owner = theUdimClaims[self.rna.name]
+            if claim == udim:
+                return
+            elif owner != id(self):
+                self.unshare()
+        theUdimClaims[self.rna.name] = (udim, id(self))
+        offset = udim - self.rna.DazUDim
         try:
             self.rna.DazUDim = udim
         except ValueError:
             print("UDIM out of range: %d" % udim)
         self.rna.DazVDim = 0
-        addUdim(self.rna, udim, 0)
+        addUdim(self.rna, offset, 0)
+
+
+    def unshare(self):
+        # A shared material needs another UDIM offset,
+        # so this asset gets its own copy.
+        old = self.rna
+        self.rna = old.copy()
+        self.shared = False
+        if "DazSignature" in self.rna.keys():
+            del self.rna["DazSignature"]
+        geo = self.geometry
+        if geo and isinstance(geo.rna, bpy.types.Mesh):
+            for mn,mat in enumerate(geo.rna.materials):
+                if mat == old:
+                    geo.rna.materials[mn] = self.rna
 
 
     def fromMaterial(self, mat, ob):
@@ -402,6 +480,15 @@ class Material(Asset):
 
 
     def isActive(self, name):
+        if not self.useResolution:
+            return self.lookupActive(name)
+        active = self.getResolution()["active"]
+        if name not in active.keys():
+            active[name] = self.lookupActive(name)
+        return active[name]
+
+
+    def lookupActive(self, name):
         cname = "%s Active" % name
         if cname in self.channels.keys():
             channel = self.channels[cname]
@@ -417,6 +504,16 @@ class Material(Asset):
 
 
     def getChannel(self, attr):
+        if not self.useResolution:
+            return self.lookupChannel(attr)
+        lookup = self.getResolution()["lookup"]
+        key = (attr if isinstance(attr, str) else tuple(attr))
+        if key not in lookup.keys():
+            lookup[key] = self.lookupChannel(attr)
+        return lookup[key]
+
+
+    def lookupChannel(self, attr):
         if isinstance(attr, str):
             return getattr(self, attr)()
         for key in attr:
@@ -493,7 +590,18 @@ class Material(Asset):
             channel = channel[0]
         if channel is None:
             return [],[]
-        elif "image" in channel.keys():
+        if not self.useResolution:
+            return self.findTextures(channel)
+        textures = self.getResolution()["textures"]
+        key = id(channel)
+        if key not in textures.keys() or textures[key][0] is not channel:
+            textures[key] = (channel, self.findTextures(channel))
+        texs,maps = textures[key][1]
+        return list(texs), list(maps)
+
+
+    def findTextures(self, channel):
+        if "image" in channel.keys():
             if channel["image"] is None:
                 return [],[]
             else:
@@ -543,6 +651,32 @@ class Material(Asset):
         return (self.getTextures(channel)[0] != [])
 
 
+    def getResolution(self):
+        res = self.resolution
+        if res is None or res["channels"] is not self.channels:
+            res = self.resolution = {
+                "channels" : self.channels,
+                "lookup" : {},
+                "textures" : {},
+                "active" : {},
+            }
+        return res
+
+
+    def resolveChannels(self):
+        # Resolve all getChannel accessors once, so the tree builders
+        # only do dictionary lookups. Textures are resolved when first
+        # asked for. The table is dropped whenever the channels change.
+        if not self.useResolution:
+            return
+        self.resolution = None
+        for attr in ChannelAccessors:
+            self.getChannel(attr)
+        for key in self.channels.keys():
+            if key[-7:] == " Active":
+                self.isActive(key[:-7])
+
+
     def hasAnyTexture(self):
         for key in self.channels:
             channel = self.getChannel([key])
@@ -655,13 +789,166 @@ def loadImage(url):
         img = None
         if theSettings.verbosity > 2:
             print('Image not found:  \n"%s"' % filepath)
+    else:
+        img = getRegisteredImage(filepath)
+        theImages[url] = img
+    return img
+
+#-------------------------------------------------------------
+#   Image registry.
+#   Images are keyed by resolved file path and modification time,
+#   so different urls for the same file share one image. The
+#   registry stores image names, survives clearMaterials and is
+#   cleared when a file is loaded. Images that are already in
+#   bpy.data are reused, and reloaded if the file has changed.
+#-------------------------------------------------------------
+
+theImageRegistry = {}
+theImagePaths = None
+theImageStats = {"loaded" : 0, "reused" : 0, "deferred" : 0}
+
+def getImageKey(filepath):
+    path = os.path.normcase(os.path.realpath(bpy.path.abspath(filepath)))
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0
+    return path, mtime
+
+
+def getExistingImages():
+    global theImagePaths
+    if theImagePaths is None:
+        theImagePaths = {}
+        for img in bpy.data.images:
+            if img.source == 'FILE' and img.filepath:
+                path,mtime = getImageKey(img.filepath)
+                theImagePaths[path] = img.name
+    return theImagePaths
+
+
+def clearImageRegistry():
+    global theImageRegistry, theImagePaths
+    theImageRegistry = {}
+    theImagePaths = None
+
+
+def getUsableImage(name, key):
+    img = (bpy.data.images.get(name) if name else None)
+    if (img is None or
+        img.is_dirty or
+        img.source != 'FILE' or
+        getImageKey(img.filepath)[0] != key[0]):
+        return None
+    if img.get("DazMtime") != key[1]:
+        if not img.packed_file:
+            img.reload()
+        img["DazMtime"] = key[1]
+    return img
+
+
+def getRegisteredImage(filepath):
+    key = getImageKey(filepath)
+    img = getUsableImage(theImageRegistry.get(key), key)
+    if img is None:
+        img = getUsableImage(getExistingImages().get(key[0]), key)
+    if img is not None:
+        theImageStats["reused"] += 1
+    elif theSettings.deferImages:
+        img = makeDeferredImage(filepath)
+        theImageStats["deferred"] += 1
     else:
         img = bpy.data.images.load(filepath)
         img.name = os.path.splitext(os.path.basename(filepath))[0]
-        theImages[url] = img
+        theImageStats["loaded"] += 1
+    img["DazMtime"] = key[1]
+    theImageRegistry[key] = img.name
+    getExistingImages()[key[0]] = img.name
+    return img
+
+
+def reportImageStats():
+    if theImageStats["reused"]:
+        print("Loaded %d images, reused %d" % (theImageStats["loaded"], theImageStats["reused"]))
+    if theImageStats["deferred"]:
+        print("Deferred loading of %d images" % theImageStats["deferred"])
+
+#-------------------------------------------------------------
+#   Deferred images.
+#   The datablock only points at the file, and Blender reads the
+#   pixels the first time the image is drawn or rendered, or when
+#   the images are prewarmed.
+#-------------------------------------------------------------
+
+def makeDeferredImage(filepath):
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    img = bpy.data.images.new(name, 1, 1)
+    img.source = 'FILE'
+    img.filepath = filepath
+    img["DazDeferred"] = True
     return img
 
 
+def getDeferredImages():
+    return [img for img in bpy.data.images
+            if img.get("DazDeferred") and not img.has_data]
+
+
+def prewarmImage(img):
+    try:
+        # Reading the size makes Blender load the image buffer
+        img.size[0]
+    except RuntimeError:
+        print("Cannot load %s" % img.filepath)
+    del img["DazDeferred"]
+
+
+class DAZ_OT_PrewarmImages(bpy.types.Operator):
+    bl_idname = "daz.prewarm_images"
+    bl_label = "Prewarm Images"
+    bl_description = "Load the pixels of images whose loading was deferred during import, a few at a time in the background.\nPress Esc to stop"
+
+    batch = 4
+
+    def execute(self, context):
+        for img in getDeferredImages():
+            prewarmImage(img)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        self.images = getDeferredImages()
+        if not self.images:
+            print("No deferred images")
+            return{'FINISHED'}
+        self.nimages = len(self.images)
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            print("Prewarming stopped, %d images left" % len(self.images))
+            return {'CANCELLED'}
+        elif event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        for img in self.images[:self.batch]:
+            try:
+                prewarmImage(img)
+            except ReferenceError:
+                pass
+        self.images = self.images[self.batch:]
+        if self.images:
+            return {'PASS_THROUGH'}
+        self.finish(context)
+        print("Prewarmed %d images" % self.nimages)
+        return {'FINISHED'}
+
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+
+
 class Images(Asset):
     def __init__(self, fileref):
         Asset.__init__(self, fileref)
@@ -904,11 +1191,79 @@ def addUdimTree(tree, udim, vdim):
 #
 #-------------------------------------------------------------
 
+#-------------------------------------------------------------
+#   Material registry.
+#   Materials are registered by a signature over channels, uv sets
+#   and settings, computed before the node tree is built. A later
+#   material with the same signature reuses the Blender material.
+#   Only materials created during the current import are matched,
+#   since materials from earlier imports may have been edited.
+#-------------------------------------------------------------
+
+SignatureSettings = [
+    "autoMaterials", "handleOpaque", "handleRefractive", "renderMethod",
+    "useEnvironment", "chooseColors", "useTextures", "useDisplacement",
+    "useNormal", "useTranslucency", "useSSS", "useEmission", "useReflection",
+]
+
+SignatureSceneProps = [
+    "DazMergeShells", "DazMaxBump", "DazDiffuseShader", "DazSpecularShader",
+]
+
+theMaterialRegistry = None
+theUdimClaims = {}
+
+def getMaterialRegistry():
+    global theMaterialRegistry
+    if theMaterialRegistry is None:
+        theMaterialRegistry = {}
+    return theMaterialRegistry
+
+
+def findSharedMaterial(sig):
+    if sig is None:
+        return None
+    registry = getMaterialRegistry()
+    mat = registry.get(sig)
+    if mat is not None:
+        try:
+            if mat.get("DazSignature") == sig:
+                return mat
+        except ReferenceError:
+            pass
+        del registry[sig]
+    return None
+
+
+def registerMaterial(mat, sig):
+    if sig is None:
+        return
+    mat["DazSignature"] = sig
+    getMaterialRegistry()[sig] = mat
+
+
+def unregisterMaterial(mat, sig):
+    if sig is None:
+        return
+    if "DazSignature" in mat.keys():
+        del mat["DazSignature"]
+    registry = getMaterialRegistry()
+    if registry.get(sig) == mat:
+        del registry[sig]
+
+
 def clearMaterials():
-    global theImages, theTextures, theGammas
+    global theImages, theTextures, theGammas, theImagePaths
+    global theMaterialRegistry, theUdimClaims
     theImages = {}
     theTextures = {}
     theGammas = {}
+    theImagePaths = None
+    theMaterialRegistry = None
+    theUdimClaims = {}
+    theImageStats["loaded"] = 0
+    theImageStats["reused"] = 0
+    theImageStats["deferred"] = 0
 
 
 clearMaterials()
@@ -925,8 +1280,87 @@ def isBlack(color):
 #   Save local textures
 #-------------------------------------------------------------
 
+#-------------------------------------------------------------
+#   Local texture copies.
+#   Files with the same content are copied once, as hardlinks
+#   where the filesystem allows it. Existing files are never
+#   overwritten: a target with the same size and a later time, or
+#   with the same content, is reused, and otherwise a numbered
+#   name is chosen.
+#-------------------------------------------------------------
+
+def getFileHash(path):
+    import hashlib
+    md5 = hashlib.md5()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def isUpToDate(src, trg):
+    try:
+        sstat = os.stat(src)
+        tstat = os.stat(trg)
+    except OSError:
+        return False
+    return (sstat.st_size == tstat.st_size and
+            tstat.st_mtime >= sstat.st_mtime)
+
+
+def isSameContent(src, trg):
+    try:
+        return (os.path.samefile(src, trg) or
+                (os.path.getsize(src) == os.path.getsize(trg) and
+                 getFileHash(src) == getFileHash(trg)))
+    except OSError:
+        return False
+
+
+def getLocalTarget(texpath, src, key, claimed):
+    fname,ext = os.path.splitext(bpy.path.basename(src))
+    trg = os.path.join(texpath, fname + ext)
+    n = 0
+    while True:
+        if trg in claimed.keys():
+            if claimed[trg] == key:
+                return trg
+        elif not os.path.exists(trg):
+            break
+        elif isUpToDate(src, trg) or isSameContent(src, trg):
+            break
+        else:
+            claimed[trg] = None
+        n += 1
+        trg = os.path.join(texpath, "%s-%d%s" % (fname, n, ext))
+    claimed[trg] = key
+    return trg
+
+
+def isLocalFile(path, texpath):
+    return (os.path.normcase(os.path.dirname(path)) == os.path.normcase(texpath))
+
+
+def copyTexture(job):
+    import shutil
+    src,trg = job
+    if os.path.exists(trg):
+        return "skipped", 0
+    try:
+        try:
+            os.link(src, trg)
+            return "linked", 0
+        except (OSError, AttributeError):
+            shutil.copy2(src, trg)
+            return "copied", os.path.getsize(trg)
+    except OSError as err:
+        print("Cannot copy %s:\n  %s" % (src, err))
+        return "failed", 0
+
+
 def saveLocalTextureCopies(context):
-    from shutil import copyfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
     if not bpy.data.filepath:
         raise DazError("Save the blend file first")
     texpath = os.path.join(os.path.dirname(bpy.data.filepath), "textures")
@@ -947,15 +1381,85 @@ def saveLocalTextureCopies(context):
                             if hasattr(tex, "image") and tex.image:
                                 images.append(tex.image)
 
-
+    t1 = time.clock()
+    sources = OrderedDict()
     for img in images:
+        if (img is None or
+            img.source in ['GENERATED', 'VIEWER'] or
+            img.packed_file):
+            continue
         src = bpy.path.abspath(img.filepath)
         src = bpy.path.reduce_dirs([src])[0]
-        trg = os.path.join(texpath, bpy.path.basename(src))
-        if src != trg and not os.path.exists(trg):
-            print("Copy %s\n => %s" % (src, trg))
-            copyfile(src, trg)
-        img.filepath = bpy.path.relpath(trg)
+        if not os.path.isfile(src):
+            print("Missing %s" % src)
+            continue
+        if src not in sources.keys():
+            sources[src] = []
+        if img not in sources[src]:
+            sources[src].append(img)
+
+    # Only files with the same size need to be hashed
+    sizes = {}
+    for src in sources.keys():
+        size = os.path.getsize(src)
+        if size not in sizes.keys():
+            sizes[size] = []
+        sizes[size].append(src)
+    tohash = [src for srcs in sizes.values() if len(srcs) > 1 for src in srcs]
+    nworkers = min(8, 2*(os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=nworkers) as pool:
+        hashes = dict(zip(tohash, pool.map(getFileHash, tohash)))
+
+    # Sources that are already local are their own targets
+    targets = {}
+    claimed = {}
+    ndupes = 0
+    for src in sources.keys():
+        key = hashes.get(src, src)
+        if isLocalFile(src, texpath):
+            if key in targets.keys():
+                ndupes += 1
+            else:
+                targets[key] = src
+            claimed[src] = key
+
+    jobs = []
+    for src in sources.keys():
+        key = hashes.get(src, src)
+        if isLocalFile(src, texpath):
+            continue
+        elif key in targets.keys():
+            ndupes += 1
+            continue
+        trg = targets[key] = getLocalTarget(texpath, src, key, claimed)
+        jobs.append((src, trg))
+
+    stats = {"copied" : 0, "linked" : 0, "skipped" : 0, "failed" : 0}
+    nbytes = 0
+    failed = []
+    wm = context.window_manager
+    wm.progress_begin(0, max(1, len(jobs)))
+    with ThreadPoolExecutor(max_workers=nworkers) as pool:
+        futures = dict([(pool.submit(copyTexture, job), job) for job in jobs])
+        for n,future in enumerate(as_completed(futures)):
+            result,size = future.result()
+            stats[result] += 1
+            nbytes += size
+            if result == "failed":
+                failed.append(futures[future][1])
+            wm.progress_update(n)
+    wm.progress_end()
+
+    for src,imgs in sources.items():
+        trg = targets[hashes.get(src, src)]
+        if trg in failed:
+            continue
+        for img in imgs:
+            img.filepath = bpy.path.relpath(trg)
+    t2 = time.clock()
+    print("%d textures: %d copied (%.1f MB), %d linked, %d up to date, %d duplicates, %d failed, %.1f s" %
+          (len(sources), stats["copied"], nbytes/(1024*1024.0), stats["linked"],
+           stats["skipped"], ndupes, stats["failed"], t2-t1))
 
 
 def saveNodesInTree(tree, images):                    
@@ -994,11 +1498,18 @@ def mergeMaterials(ob):
     matlist = []
     assoc = {}
     reindex = {}
+    buckets = {}
+    fingerprints = {}
     m = 0
     reduced = False
     for n,mat1 in enumerate(ob.data.materials):
         unique = True
-        for mat2 in matlist:
+        if mat1.name not in fingerprints.keys():
+            fingerprints[mat1.name] = getMaterialFingerprint(mat1)
+        key = fingerprints[mat1.name]
+        if key not in buckets.keys():
+            buckets[key] = []
+        for mat2 in buckets[key]:
             if areSameMaterial(mat1, mat2):
                 reindex[n] = assoc[mat2.name]
                 unique = False
@@ -1006,6 +1517,7 @@ def mergeMaterials(ob):
                 break
         if unique:
             matlist.append(mat1)
+            buckets[key].append(mat1)
             reindex[n] = assoc[mat1.name] = m
             m += 1
     if reduced:
@@ -1017,6 +1529,64 @@ def mergeMaterials(ob):
             ob.data.materials.pop()
 
 
+#-------------------------------------------------------------
+#   Material fingerprints.
+#   A hash over the properties that areSameMaterial compares, so that
+#   only materials with equal fingerprints need a deep comparison.
+#-------------------------------------------------------------
+
+FingerprintProps = [
+    "diffuse_color", "specular_color", "specular_intensity",
+    "roughness", "metallic", "alpha", "blend_method", "use_backface_culling",
+]
+
+def getMaterialFingerprint(mat):
+    import hashlib
+    data = [mat.use_nodes]
+    for prop in FingerprintProps:
+        data.append(getHashable(getattr(mat, prop, None)))
+    if mat.use_nodes and mat.node_tree:
+        data.append(getTreeFingerprint(mat.node_tree))
+    elif hasattr(mat, "texture_slots"):
+        for mtex in mat.texture_slots:
+            if mtex and hasattr(mtex.texture, "image") and mtex.texture.image:
+                data.append(mtex.texture.image.filepath)
+            else:
+                data.append(None)
+    return hashlib.md5(repr(data).encode("utf-8")).hexdigest()
+
+
+def getTreeFingerprint(tree):
+    nodes = []
+    for node in tree.nodes:
+        inputs = []
+        for socket in node.inputs:
+            if hasattr(socket, "default_value"):
+                inputs.append(getHashable(socket.default_value))
+        if node.type == 'TEX_IMAGE' and node.image:
+            extra = node.image.name
+        elif node.type == 'GROUP' and node.node_tree:
+            extra = node.node_tree.name
+        else:
+            extra = None
+        nodes.append((node.name, node.type, extra, tuple(inputs)))
+    links = [(link.from_node.name, link.from_socket.name,
+              link.to_node.name, link.to_socket.name)
+             for link in tree.links]
+    nodes.sort()
+    links.sort()
+    return (tuple(nodes), tuple(links))
+
+
+def getHashable(value):
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    elif hasattr(value, "__len__"):
+        return tuple([getHashable(x) for x in value])
+    else:
+        return str(value)
+
+
 def areSameMaterial(mat1, mat2):
     deadMatProps = [
         "texture_slots", "node_tree",
@@ -1563,10 +2133,30 @@ class DAZ_OT_LoadMaterial(bpy.types.Operator, DazImageFile, MultiFile):
 #   Resize textures
 # ---------------------------------------------------------------------
 
+def getSingleUserGroup(node, copies):
+    # Node groups may be shared with unselected meshes, so they are
+    # copied before they are edited. An edited group no longer matches
+    # its registry key.
+    group = node.node_tree
+    if group.name in copies.keys():
+        node.node_tree = copies[group.name]
+        return node.node_tree
+    if group.users > 1:
+        copy = group.copy()
+        copies[group.name] = copy
+        node.node_tree = group = copy
+    else:
+        copies[group.name] = group
+    if "DazGroupKey" in group.keys():
+        del group["DazGroupKey"]
+    return group
+
+
 class ChangeResolution:
     def __init__(self):
         self.filenames = []
         self.images = {}
+        self.groupCopies = {}
 
 
     def getFileNames(self, paths):
@@ -1576,6 +2166,7 @@ class ChangeResolution:
 
 
     def replaceTextures(self, context):
+        self.groupCopies = {}
         for ob in getSceneObjects(context):
             if ob.type == 'MESH' and getSelected(ob):
                 for mat in ob.data.materials:
@@ -1592,8 +2183,8 @@ class ChangeResolution:
             if node.type == 'TEX_IMAGE':
                 newimg = self.replaceImage(node.image)
                 node.image = newimg
-            elif node.type == 'GROUP':
-                self.resizeTree(node.node_tree)
+            elif node.type == 'GROUP' and node.node_tree:
+                self.resizeTree(getSingleUserGroup(node, self.groupCopies))
 
 
     def getBasePath(self, path):
@@ -1717,7 +2308,207 @@ class DAZ_OT_ChangeResolution(bpy.types.Operator, ResizeOptions, ChangeResolutio
             if node.type == 'TEX_IMAGE':
                 self.paths[node.image.filepath] = True
             elif node.type == 'GROUP':
-                self.resizeTree(node.node_tree)
+                self.getTreeTextures(node.node_tree)
+
+
+#-------------------------------------------------------------
+#   Resolution planner.
+#   Texel density = sqrt(texels covering the faces / world area).
+#   Each image gets the most resize steps that keep the density
+#   above the target for every material that uses it.
+#-------------------------------------------------------------
+
+def getMaterialAreas(ob):
+    me = ob.data.copy()
+    me.transform(ob.matrix_world)
+    nmats = max(1, len(me.materials))
+    areas = [0.0 for mn in range(nmats)]
+    uvareas = [0.0 for mn in range(nmats)]
+    uvlayer = me.uv_layers.active
+    for f in me.polygons:
+        mn = min(f.material_index, nmats-1)
+        areas[mn] += f.area
+        if uvlayer:
+            uvs = [uvlayer.data[vn].uv for vn in f.loop_indices]
+            uvareas[mn] += getUvArea(uvs)
+    bpy.data.meshes.remove(me, do_unlink=True)
+    return areas, uvareas
+
+
+def getUvArea(uvs):
+    area = 0
+    for n in range(len(uvs)):
+        u0,v0 = uvs[n-1]
+        u1,v1 = uvs[n]
+        area += u0*v1 - u1*v0
+    return abs(area)/2
+
+
+def getMaterialImages(mat):
+    images = []
+    if mat.node_tree:
+        getTreeImages(mat.node_tree, images)
+    elif hasattr(mat, "texture_slots"):
+        for mtex in mat.texture_slots:
+            if mtex and mtex.texture.type == 'IMAGE' and mtex.texture.image:
+                images.append(mtex.texture.image)
+    return images
+
+
+def getTreeImages(tree, images):
+    for node in tree.nodes.values():
+        if node.type == 'TEX_IMAGE' and node.image:
+            images.append(node.image)
+        elif node.type == 'GROUP' and node.node_tree:
+            getTreeImages(node.node_tree, images)
+
+
+def getImageSteps(path):
+    fname = os.path.splitext(path)[0]
+    if fname[-5:-1] == "-res" and fname[-1].isdigit():
+        return int(fname[-1])
+    else:
+        return 0
+
+
+def getTextureBytes(size, steps, isfloat):
+    w,h = size
+    nbytes = (w >> steps)*(h >> steps)*4
+    if isfloat:
+        nbytes *= 4
+    return nbytes
+
+
+def getPixelsPerUnit(scn, ob):
+    import math
+    cam = scn.camera
+    if cam is None:
+        raise DazError("Scene has no camera")
+    width = scn.render.resolution_x*scn.render.resolution_percentage/100.0
+    if cam.data.type == 'ORTHO':
+        return width/cam.data.ortho_scale
+    dist = (ob.matrix_world.to_translation() - cam.matrix_world.to_translation()).length
+    dist = max(dist, 1e-3)
+    return width/(2*dist*math.tan(cam.data.angle/2))
+
+
+class DAZ_OT_PlanResolution(bpy.types.Operator, PlannerOptions, ChangeResolution):
+    bl_idname = "daz.plan_resolution"
+    bl_label = "Plan Resolution"
+    bl_description = (
+        "Change the textures of selected meshes to the smallest resized versions\n" +
+        "that keep the texel density above the target.\n" +
+        "The resized textures must already exist.")
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(self, context):
+        return (context.object and context.object.type == 'MESH')
+
+    def draw(self, context):
+        self.layout.prop(self, "useCamera")
+        if self.useCamera:
+            self.layout.prop(self, "texelsPerPixel")
+        else:
+            self.layout.prop(self, "targetDensity")
+        self.layout.prop(self, "maxSteps")
+        self.layout.prop(self, "useApply")
+
+    def execute(self, context):
+        try:
+            self.planResolution(context)
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_props_dialog(self)
+        return {'RUNNING_MODAL'}
+
+
+    def planResolution(self, context):
+        scn = context.scene
+        self.overwrite = False
+        self.plan = {}
+        for ob in getSceneObjects(context):
+            if ob.type == 'MESH' and getSelected(ob):
+                self.planMesh(scn, ob)
+        if not self.plan:
+            print("No textures to plan")
+            return
+
+        oldbytes = newbytes = 0
+        for path,(steps,size,oldsteps,isfloat) in self.plan.items():
+            oldbytes += getTextureBytes(size, oldsteps, isfloat)
+            newbytes += getTextureBytes(size, steps, isfloat)
+            if steps != oldsteps:
+                print("%s: res%d => res%d" % (bpy.path.basename(path), oldsteps, steps))
+        mb = 1.0/(1024*1024)
+        print("Texture memory %.1f MB => %.1f MB, saving %.1f MB" %
+              (oldbytes*mb, newbytes*mb, (oldbytes-newbytes)*mb))
+
+        if self.useApply:
+            self.groupCopies = {}
+            self.filenames = [bpy.path.basename(path) for path in self.plan.keys()]
+            for ob in getSceneObjects(context):
+                if ob.type == 'MESH' and getSelected(ob):
+                    for mat in ob.data.materials:
+                        if mat and mat.node_tree:
+                            self.planTree(mat.node_tree)
+                        elif mat:
+                            for mtex in mat.texture_slots:
+                                if mtex and mtex.texture.type == 'IMAGE':
+                                    mtex.texture.image = self.planImage(mtex.texture.image)
+
+
+    def planMesh(self, scn, ob):
+        if self.useCamera:
+            target = self.texelsPerPixel*getPixelsPerUnit(scn, ob)
+        else:
+            target = self.targetDensity
+        areas,uvareas = getMaterialAreas(ob)
+        for mn,mat in enumerate(ob.data.materials):
+            if mat is None or areas[mn] == 0 or uvareas[mn] == 0:
+                continue
+            for img in getMaterialImages(mat):
+                path = self.getBasePath(img.filepath)
+                oldsteps = getImageSteps(img.filepath)
+                w,h = img.size
+                if w == 0 or h == 0:
+                    continue
+                size = (w << oldsteps, h << oldsteps)
+                density = (size[0]*size[1]*uvareas[mn]/areas[mn])**0.5
+                steps = self.getSteps(density, target)
+                if path in self.plan.keys():
+                    steps = min(steps, self.plan[path][0])
+                    oldsteps = self.plan[path][2]
+                self.plan[path] = (steps, size, oldsteps, img.is_float)
+
+
+    def getSteps(self, density, target):
+        steps = 0
+        while steps < self.maxSteps and density >= 2*target:
+            density /= 2
+            steps += 1
+        return steps
+
+
+    def planTree(self, tree):
+        for node in tree.nodes.values():
+            if node.type == 'TEX_IMAGE':
+                node.image = self.planImage(node.image)
+            elif node.type == 'GROUP' and node.node_tree:
+                self.planTree(getSingleUserGroup(node, self.groupCopies))
+
+
+    def planImage(self, img):
+        if img is None:
+            return None
+        path = self.getBasePath(img.filepath)
+        if path not in self.plan.keys():
+            return img
+        self.steps = self.plan[path][0]
+        return self.replaceImage(img)
 
 
 class DAZ_OT_ResizeTextures(bpy.types.Operator, ImageFile, MultiFile, ResizeOptions, ChangeResolution):
@@ -1751,20 +2542,35 @@ class DAZ_OT_ResizeTextures(bpy.types.Operator, ImageFile, MultiFile, ResizeOpti
         paths = getMultiFiles(self, theImageExtensions)
         self.getFileNames(paths)
         
+        self.runResizer(paths)
+        self.replaceTextures(context)
+
+
+    def runResizer(self, paths):
+        # All images are resized by one call to the standalone script,
+        # which runs a process pool and skips up to date files.
+        import subprocess
+        import tempfile
+        if self.steps == 0 or not paths:
+            return
         program = os.path.join(os.path.dirname(__file__), "standalone/resize.py")
-        if self.overwrite:
-            overwrite = "-o"
+        if self.useAllTiers and not self.overwrite:
+            tiers = [str(steps) for steps in range(1, self.steps+1)]
         else:
-            overwrite = ""
-        for path in paths:                    
-            _,newpath = self.getNewPath(self.getBasePath(path))
-            if not os.path.exists(newpath):
-                cmd = ('python "%s" "%s" %d %s' % (program, path, self.steps, overwrite))
-                os.system(cmd)
-            else:
-                print("Skip", os.path.basename(newpath))
-        
-        self.replaceTextures(context)                
+            tiers = [str(self.steps)]
+        fd,listfile = tempfile.mkstemp(suffix=".txt", text=True)
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            for path in paths:
+                fp.write("%s\n" % path)
+        cmd = ["python", program, "--list", listfile, "--steps"] + tiers
+        if self.overwrite:
+            cmd.append("-o")
+        try:
+            subprocess.call(cmd)
+        except OSError:
+            raise DazError("Cannot run Python.\nPython and OpenCV must be installed on your system.")
+        finally:
+            os.remove(listfile)
 
 #----------------------------------------------------------
 #   Initialize
@@ -1781,7 +2587,9 @@ classes = [
     DAZ_OT_ShareMaterials,
     DAZ_OT_LoadMaterial,
     DAZ_OT_ChangeResolution,
+    DAZ_OT_PlanResolution,
     DAZ_OT_ResizeTextures,
+    DAZ_OT_PrewarmImages,
 ]
 
 def initialize():
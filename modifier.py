@@ -419,12 +419,46 @@ class FormulaAsset(Formula, Modifier):
 #   Morph
 #-------------------------------------------------------------
 
+theMorphStats = {"keys" : 0, "deltas" : 0, "baked" : 0}
+theAnimatedMorphs = {}
+theFormulaTargets = {}
+
+def clearMorphStats():
+    global theAnimatedMorphs, theFormulaTargets
+    for key in theMorphStats.keys():
+        theMorphStats[key] = 0
+    theAnimatedMorphs = {}
+    theFormulaTargets = {}
+
+
+def reportMorphStats():
+    if theMorphStats["keys"] or theMorphStats["deltas"]:
+        print("Pruned %d null shapekeys and %d small deltas" % (theMorphStats["keys"], theMorphStats["deltas"]))
+    if theMorphStats["baked"]:
+        print("Baked %d constant morphs into base meshes" % theMorphStats["baked"])
+
+
+def getUrlName(url):
+    from urllib.parse import unquote
+    ref = url.split("?",1)[0]
+    return unquote(ref.rsplit("#",1)[-1])
+
+
+def addAnimatedMorph(url):
+    theAnimatedMorphs[getUrlName(url)] = True
+
+
+def addFormulaTarget(url):
+    theFormulaTargets[getUrlName(url)] = True
+
+
 class Morph(FormulaAsset):
 
     def __init__(self, fileref):
         FormulaAsset.__init__(self, fileref)
         self.type = "morph"
         self.vertex_count = 0
+        self.cachedDeltas = None
 
 
     def __repr__(self):
@@ -437,6 +471,7 @@ class Morph(FormulaAsset):
             return
         self.parent = struct["parent"]
         self.deltas = struct["morph"]["deltas"]["values"]
+        self.cachedDeltas = None
         self.vertex_count = struct["morph"]["vertex_count"]
 
 
@@ -533,30 +568,93 @@ class Morph(FormulaAsset):
                 continue
             elif theSettings.applyMorphs:
                 self.addMorphToVerts(ob.data, cscale)
-            elif self.value > 0.0:
+            elif self.value <= 0.0:
+                pass
+            elif theSettings.bakeConstantMorphs and self.isConstant(value):
+                self.addMorphToVerts(ob.data, cscale)
+                theMorphStats["baked"] += 1
+            else:
                 self.buildMorph(ob, cscale)
         return self
 
 
+    def isConstant(self, value):
+        if value >= 0 or self.formulas:
+            return False
+        for name in [self.name, getName(self.id)]:
+            if (name in theAnimatedMorphs.keys() or
+                name in theFormulaTargets.keys()):
+                return False
+        return True
+
+
+    def getDeltas(self, cscale):
+        import numpy as np
+        key = (cscale, theSettings.scale, theSettings.zup, theSettings.pruneMorphs, theSettings.morphEpsilon)
+        if self.cachedDeltas and self.cachedDeltas[0] == key:
+            return self.cachedDeltas[1]
+
+        deltas = np.array(self.deltas, dtype=np.float64).reshape((-1,4))
+        vnums = deltas[:,0].astype(np.int32)
+        offsets = deltas[:,1:] * (cscale * theSettings.scale)
+        if theSettings.zup:
+            offsets = offsets[:,[0,2,1]]
+            offsets[:,1] *= -1
+        if theSettings.pruneMorphs:
+            eps = theSettings.morphEpsilon
+            keep = (np.sum(offsets*offsets, axis=1) > eps*eps)
+            nremoved = len(vnums) - np.count_nonzero(keep)
+            if nremoved:
+                vnums = vnums[keep]
+                offsets = offsets[keep]
+                theMorphStats["deltas"] += nremoved
+        result = (vnums, offsets.astype(np.float32))
+        self.cachedDeltas = (key, result)
+        return result
+
+
+    def isNullMorph(self, cscale):
+        vnums,offsets = self.getDeltas(cscale)
+        return (len(vnums) == 0)
+
+
     def addMorphToVerts(self, me, cscale):
+        import numpy as np
         if self.value == 0.0:
             return
 
-        scale = self.value * cscale * theSettings.scale
-        for delta in self.deltas:
-            vn = delta[0]
-            me.vertices[vn].co += scale * d2bu(delta[1:])
+        vnums,offsets = self.getDeltas(cscale)
+        offsets = self.value * offsets
+        nverts = len(me.vertices)
+        coords = np.empty(3*nverts, dtype=np.float32)
+        me.vertices.foreach_get("co", coords)
+        coords = coords.reshape((nverts,3))
+        np.add.at(coords, vnums, offsets)
+        me.vertices.foreach_set("co", coords.ravel())
+        if me.shape_keys:
+            for skey in me.shape_keys.key_blocks:
+                skey.data.foreach_get("co", coords.ravel())
+                np.add.at(coords, vnums, offsets)
+                skey.data.foreach_set("co", coords.ravel())
 
 
     def buildMorph(self, ob, cscale, useSoftLimits=False):
+        sname = getName(self.id)
+        if (ob.data.shape_keys and
+            sname in ob.data.shape_keys.key_blocks.keys()):
+            skey = ob.data.shape_keys.key_blocks[sname]
+            ob.shape_key_remove(skey)
+        if theSettings.pruneMorphs and self.isNullMorph(cscale):
+            theMorphStats["keys"] += 1
+            if theSettings.verbosity > 2:
+                print("Null morph %s skipped" % sname)
+            self.rna = None
+            return None
+
         if not ob.data.shape_keys:
             basic = ob.shape_key_add(name="Basic")
         else:
             basic = ob.data.shape_keys.key_blocks[0]
-        sname = getName(self.id)
-        if sname in ob.data.shape_keys.key_blocks.keys():
-            skey = ob.data.shape_keys.key_blocks[sname]
-            ob.shape_key_remove(skey)
         skey = ob.shape_key_add(name=sname)
         if useSoftLimits:
             skey.slider_min = self.min if self.min is not None and theSettings.useDazPropLimits else theSettings.propMin
@@ -564,21 +662,19 @@ class Morph(FormulaAsset):
         skey.value = self.value
         self.rna = (skey, ob, sname)
         self.buildShapeKey(ob, skey, cscale)
+        return skey
 
 
     def buildShapeKey(self, ob, skey, cscale):
-        for v in ob.data.vertices:
-            skey.data[v.index].co = v.co
-
-        scale = cscale * theSettings.scale
-        if theSettings.zup:
-            for delta in self.deltas:
-                vn = delta[0]
-                skey.data[vn].co += scale * d2b90u(delta[1:])
-        else:
-            for delta in self.deltas:
-                vn = delta[1]
-                skey.data[vn].co += scale * d2b00u(delta[1:])
+        import numpy as np
+        me = ob.data
+        nverts = len(me.vertices)
+        coords = np.empty(3*nverts, dtype=np.float32)
+        me.vertices.foreach_get("co", coords)
+        coords = coords.reshape((nverts,3))
+        vnums,offsets = self.getDeltas(cscale)
+        np.add.at(coords, vnums, offsets)
+        skey.data.foreach_set("co", coords.ravel())
 
 
     def rebuild(self, geonode, value):
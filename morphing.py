@@ -344,7 +344,9 @@ class LoadMorph:
                     else:
                         raise DazError(msg)
                 return []
-            asset.buildMorph(self.mesh, ob.DazCharacterScale, self.useSoftLimits)
+            skey = asset.buildMorph(self.mesh, ob.DazCharacterScale, self.useSoftLimits)
+            if skey is None:
+                return []
             skey,ob,sname = asset.rna
             if self.rig and theSettings.useDrivers:
                 prop = propFromName(sname, self.type, self.prefix, self.rig)
@@ -411,6 +413,7 @@ class LoadAllMorphs(LoadMorph):
         import time
         from .main import finishMain
         from .finger import getFingeredCharacter
+        from .driver import beginDriverBatch, endDriverBatch
 
         scn = context.scene
         setupMorphPaths(scn, False)
@@ -448,12 +451,16 @@ class LoadAllMorphs(LoadMorph):
         t1 = time.clock()
         print("\n--------------------\n%s" % self.type)
         snames = []
-        for name,filepath in files.items():
-            if hasattr(scn, "Daz"+name) and getattr(scn, "Daz"+name):
-                print("*", name)
-                snames += self.getSingleMorph(filepath, scn)
-            else:
-                print("-", name)
+        batch = beginDriverBatch()
+        try:
+            for name,filepath in files.items():
+                if hasattr(scn, "Daz"+name) and getattr(scn, "Daz"+name):
+                    print("*", name)
+                    snames += self.getSingleMorph(filepath, scn)
+                else:
+                    print("-", name)
+        finally:
+            endDriverBatch(context, batch)
         updateDrivers(self.mesh)
         updateDrivers(self.rig)
         finishMain(filepath, t1)
@@ -562,6 +569,7 @@ class DAZ_OT_ImportMorph(bpy.types.Operator, LoadMorph, DazImageFile, MultiFile,
         from .asset import clearAssets
         from .main import finishMain
         from .fileutils import getMultiFiles
+        from .driver import beginDriverBatch, endDriverBatch
 
         if self.mesh:
             ob = self.mesh
@@ -577,14 +585,18 @@ class DAZ_OT_ImportMorph(bpy.types.Operator, LoadMorph, DazImageFile, MultiFile,
         snames = []
         paths = getMultiFiles(self, ["duf", "dsf"])
         self.suppressError = (len(paths) > 1)
-        for path in paths:
-            file = os.path.basename(path)
-            names = self.getSingleMorph(path, scn)
-            if names:
-                print("*", file)
-                snames += names
-            else:
-                print("-", file)
+        batch = beginDriverBatch()
+        try:
+            for path in paths:
+                file = os.path.basename(path)
+                names = self.getSingleMorph(path, scn)
+                if names:
+                    print("*", file)
+                    snames += names
+                else:
+                    print("-", file)
+        finally:
+            endDriverBatch(bpy.context, batch)
         updateDrivers(self.rig)
         updateDrivers(self.mesh)
         finishMain(filepath, t1)
@@ -702,6 +714,7 @@ class DAZ_OT_RemoveCategoryOK(bpy.types.Operator, ChangeCategory):
         for n,catn in enumerate(categories):
             if cat == catn:
                 categories.remove(n)
+                clearCollectionIndices()
                 break
         if key in ob.keys():
             del ob[key]
@@ -748,28 +761,38 @@ class DAZ_OT_ChangeCategory(bpy.types.Operator, CatGroupString, ActionString):
 #------------------------------------------------------------------------
 
 def getShapeKeyCoords(ob):
-    coords = [v.co for v in ob.data.vertices]
+    import numpy as np
+    me = ob.data
+    nverts = len(me.vertices)
+    base = np.empty(3*nverts, dtype=np.float32)
+    me.vertices.foreach_get("co", base)
+    coords = base.astype(np.float64)
     skeys = []
-    if ob.data.shape_keys:
-        for skey in ob.data.shape_keys.key_blocks[1:]:
+    if me.shape_keys:
+        buf = np.empty(3*nverts, dtype=np.float32)
+        for skey in me.shape_keys.key_blocks[1:]:
             if abs(skey.value) > 1e-4:
-                coords = [co + skey.value*(skey.data[n].co - ob.data.vertices[n].co) for n,co in enumerate(coords)]
+                skey.data.foreach_get("co", buf)
+                coords += skey.value*(buf - base)
             skeys.append(skey)
-    return skeys,coords
+    return skeys, coords.reshape((nverts,3))
+
+
+def setVertexCoords(ob, coords):
+    import numpy as np
+    coords = np.asarray(coords, dtype=np.float32)
+    ob.data.vertices.foreach_set("co", coords.ravel())
+    ob.data.update()
 
 
 def applyMorphs(rig, props):
     for ob in rig.children:
-        basic = ob.data.shape_keys.key_blocks[0]
+        if ob.type != 'MESH' or ob.data.shape_keys is None:
+            continue
         skeys,coords = getShapeKeyCoords(ob)
-        for skey in skeys:
-            path = 'key_blocks["%s"].value' % skey.name
-            getDrivingProps(ob.data.shape_keys, path, props)
-            ob.shape_key_remove(skey)
-        basic = ob.data.shape_keys.key_blocks[0]
-        ob.shape_key_remove(basic)
-        for vn,co in enumerate(coords):
-            ob.data.vertices[vn].co = co
+        getDrivingProps(ob.data.shape_keys, None, props)
+        ob.shape_key_clear()
+        setVertexCoords(ob, coords)
     print("Morphs applied")
 
 
@@ -792,6 +815,7 @@ def removeDrivingProps(rig, props):
         if hasattr(rig, showname):
             delattr(rig, showname)
         rig.DazCategories.remove(cat)
+        clearCollectionIndices()
 
 #------------------------------------------------------------------------
 #   Select and unselect all
@@ -1601,26 +1625,61 @@ class DAZ_OT_ConvertMorphsToShapes(bpy.types.Operator, MorphTypes):
         return {'RUNNING_MODAL'}
     
     
-    def convertToShapes(self, context, rig, ob):    
+    def convertToShapes(self, context, rig, ob):
+        import numpy as np
         from .daz import getPropGroupProps
+        if not [mod for mod in ob.modifiers if mod.type == 'ARMATURE']:
+            return
         keys = getPropGroupProps(rig)
         keys.sort()
         for key in keys:
             rig[key] = 0.0
+        morphs = []
         for key in keys:
             mname = self.getMorphName(key, ob)
-            if (ob.data.shape_keys and 
+            if (ob.data.shape_keys and
                 mname in ob.data.shape_keys.key_blocks.keys()):
                 continue
             if mname:
-                for mod in ob.modifiers:
-                    if mod.type == 'ARMATURE':
+                morphs.append((key, mname))
+
+        # Evaluate the armature deformation only, on the basis shape
+        mods = [mod for mod in ob.modifiers if mod.type != 'ARMATURE' and mod.show_viewport]
+        for mod in mods:
+            mod.show_viewport = False
+        showOnly = ob.show_only_shape_key
+        active = ob.active_shape_key_index
+        ob.show_only_shape_key = True
+        ob.active_shape_key_index = 0
+        eps = 1e-2 * ob.DazScale    # eps = 0.1 mm
+        shapes = []
+        groups = self.getMorphGroups(rig, ob, morphs)
+        print("Evaluate %d morphs in %d groups" % (len(morphs), len(groups)))
+        try:
+            rest = self.getEvaluatedCoords(context, rig, ob)
+            for group in groups:
+                try:
+                    for key,mname,mask in group:
                         rig[key] = 1.0
-                        updateScene(context)
-                        updateRig(rig, context)
-                        self.applyArmature(ob, rig, mod, mname)
+                    coords = self.getEvaluatedCoords(context, rig, ob)
+                finally:
+                    for key,mname,mask in group:
                         rig[key] = 0.0
-                        break
+                offsets = coords - rest
+                dists = np.sqrt(np.sum(offsets*offsets, axis=1))
+                for key,mname,mask in group:
+                    mdists = (dists if mask is None else np.where(mask, dists, 0.0))
+                    if mdists.max() < eps:
+                        continue
+                    vnums = np.nonzero(mdists > 1e-2*eps)[0]
+                    shapes.append((mname, vnums, offsets[vnums]))
+        finally:
+            for mod in mods:
+                mod.show_viewport = True
+            ob.show_only_shape_key = showOnly
+            ob.active_shape_key_index = active
+
+        self.addShapes(ob, shapes)
         updateScene(context)
         updateRig(rig, context)
         updateDrivers(rig)
@@ -1638,25 +1697,129 @@ class DAZ_OT_ConvertMorphsToShapes(bpy.types.Operator, MorphTypes):
         return None                
     
 
-    def applyArmature(self, ob, rig, mod, mname):
-        mod.name = mname
-        bpy.ops.object.modifier_apply(apply_as='SHAPE', modifier=mname)
-        skey = ob.data.shape_keys.key_blocks[mname]
-        skey.value = 0.0
-        offsets = [(skey.data[vn].co - v.co).length for vn,v in enumerate(ob.data.vertices)]
-        omax = max(offsets)
-        omin = min(offsets)
-        eps = 1e-2 * ob.DazScale    # eps = 0.1 mm
-        if abs(omax) < eps and abs(omin) < eps:
-            idx = ob.data.shape_keys.key_blocks.keys().index(skey.name)
-            ob.active_shape_key_index = idx
-            bpy.ops.object.shape_key_remove()
-            ob.active_shape_key_index = 0
-        nmod = ob.modifiers.new(rig.name, "ARMATURE")
-        nmod.object = rig
-        nmod.use_deform_preserve_volume = True   
-        for i in range(len(ob.modifiers)-1):
-            bpy.ops.object.modifier_move_up(modifier=nmod.name)
+    def getMorphGroups(self, rig, ob, morphs):
+        # Morphs whose bones deform disjoint sets of vertices are
+        # evaluated together. A morph whose bones are not known is
+        # evaluated alone.
+        import numpy as np
+        nverts = len(ob.data.vertices)
+        weighted = {}
+        for vgrp in ob.vertex_groups:
+            weighted[vgrp.index] = (vgrp.name, [])
+        for v in ob.data.vertices:
+            for g in v.groups:
+                if g.weight > 0 and g.group in weighted.keys():
+                    weighted[g.group][1].append(v.index)
+        bverts = dict(weighted.values())
+
+        groups = []
+        used = []
+        for key,mname in morphs:
+            bones = self.getAffectedBones(rig, key)
+            if not bones:
+                groups.append([(key, mname, None)])
+                used.append(None)
+                continue
+            mask = np.zeros(nverts, dtype=bool)
+            for bname in bones:
+                if bname in bverts.keys():
+                    mask[bverts[bname]] = True
+            for group,umask in zip(groups, used):
+                if umask is not None and not (umask & mask).any():
+                    group.append((key, mname, mask))
+                    umask |= mask
+                    break
+            else:
+                groups.append([(key, mname, mask)])
+                used.append(mask.copy())
+        return groups
+
+
+    def getAffectedBones(self, rig, key):
+        # Bones driven by the property, directly or through other
+        # properties, their children, and bones that follow them
+        # through constraints or transform variables
+        drivers = []
+        if rig.animation_data:
+            for fcu in rig.animation_data.drivers:
+                words = fcu.data_path.split('"')
+                if fcu.data_path[0:12] == 'pose.bones["':
+                    drivers.append((words[1], None, fcu))
+                elif fcu.data_path[0:2] == '["':
+                    drivers.append((None, words[1], fcu))
+        props = {key : True}
+        bones = {}
+        nprops = nbones = -1
+        while nprops != len(props) or nbones != len(bones):
+            nprops,nbones = len(props),len(bones)
+            for pb in rig.pose.bones:
+                if pb.name in bones.keys():
+                    continue
+                elif pb.parent and pb.parent.name in bones.keys():
+                    bones[pb.name] = True
+                    continue
+                for pgs in [pb.DazLocProps, pb.DazRotProps, pb.DazScaleProps]:
+                    for pg in pgs:
+                        if pg.prop in props.keys():
+                            bones[pb.name] = True
+                for cns in pb.constraints:
+                    if getattr(cns, "subtarget", None) in bones.keys():
+                        bones[pb.name] = True
+            for bname,prop,fcu in drivers:
+                if bname in bones.keys() or prop in props.keys():
+                    continue
+                for var in fcu.driver.variables:
+                    for trg in var.targets:
+                        words = trg.data_path.split('"')
+                        if (trg.bone_target in bones.keys() or
+                            (len(words) > 1 and
+                             (words[1] in props.keys() or words[1] in bones.keys()))):
+                            if bname:
+                                bones[bname] = True
+                            else:
+                                props[prop] = True
+        return bones
+
+
+    def getEvaluatedCoords(self, context, rig, ob):
+        import numpy as np
+        rig.update_tag()
+        updateScene(context, True)
+        if bpy.app.version >= (2,80,0):
+            depsgraph = context.evaluated_depsgraph_get()
+            obeval = ob.evaluated_get(depsgraph)
+            me = obeval.to_mesh()
+        else:
+            me = ob.to_mesh(context.scene, True, 'PREVIEW')
+        nverts = len(me.vertices)
+        coords = np.empty(3*nverts, dtype=np.float32)
+        me.vertices.foreach_get("co", coords)
+        if bpy.app.version >= (2,80,0):
+            obeval.to_mesh_clear()
+        else:
+            bpy.data.meshes.remove(me)
+        if nverts != len(ob.data.vertices):
+            raise DazError("Cannot convert morphs to shapes because\nmodifiers change the vertex count of %s" % ob.name)
+        return coords.reshape((nverts,3))
+
+
+    def addShapes(self, ob, shapes):
+        import numpy as np
+        if not shapes:
+            return
+        if not ob.data.shape_keys:
+            ob.shape_key_add(name="Basic")
+        nverts = len(ob.data.vertices)
+        base = np.empty(3*nverts, dtype=np.float32)
+        ob.data.vertices.foreach_get("co", base)
+        base = base.reshape((nverts,3))
+        for mname,vnums,offsets in shapes:
+            skey = ob.shape_key_add(name=mname)
+            skey.value = 0.0
+            coords = base.copy()
+            coords[vnums] += offsets
+            skey.data.foreach_set("co", coords.ravel())
+        print("%d shapekeys added to %s" % (len(shapes), ob.name))
 
 #-------------------------------------------------------------
 #   Property groups, for drivers
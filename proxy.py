@@ -1193,18 +1193,13 @@ class DAZ_OT_SelectRandomStrands(bpy.types.Operator):
 #-------------------------------------------------------------
 
 def applyShapeKeys(ob):
-    from .morphing import getShapeKeyCoords
+    from .morphing import getShapeKeyCoords, setVertexCoords
     if ob.type != 'MESH':
         return
     if ob.data.shape_keys:
         skeys,coords = getShapeKeyCoords(ob)
-        skeys.reverse()
-        for skey in skeys:
-            ob.shape_key_remove(skey)
-        skey = ob.data.shape_keys.key_blocks[0]
-        ob.shape_key_remove(skey)
-        for v in ob.data.vertices:
-            v.co = coords[v.index]
+        ob.shape_key_clear()
+        setVertexCoords(ob, coords)
 
 
 class DAZ_OT_ApplyMorphs(bpy.types.Operator):
@@ -78,6 +78,8 @@ class RenderOptions(Asset):
 
 class WorldMaterial(CyclesMaterial):
 
+    useSharing = False
+
     def __init__(self, fileref):
         CyclesMaterial.__init__(self, fileref)
         self.name = os.path.splitext(os.path.basename(fileref))[0] + " World"
@@ -50,6 +50,9 @@ class Settings:
         self.propMax = 1.0
         self.useDazPropLimits = True
         self.useDazPropDefault = True
+        self.pruneMorphs = False
+        self.morphEpsilon = 1e-5
+        self.bakeConstantMorphs = False
         self.autoMaterials = True
         self.handleOpaque = 'BSDF'
         self.handleRefractive = 'BSDF'
@@ -71,6 +74,8 @@ class Settings:
         self.useSSS = False
         self.useEmission = False
         self.useReflection = True
+        self.reuseMaterials = False
+        self.deferImages = False
 
         self.errorPath = ""
         self.useNothing()
@@ -110,11 +115,19 @@ class Settings:
     def reset(self, scn):
         from .material import clearMaterials
         from .asset import setDazPaths, clearAssets
+        from .modifier import clearMorphStats
+        from .utils import clearCollectionIndices
+        from .formula import clearStageMemo
+        from .cgroup import clearNodeGroups
         global theTrace
         theTrace = []
         setDazPaths(scn)
         clearAssets()
         clearMaterials()
+        clearMorphStats()
+        clearCollectionIndices()
+        clearStageMemo()
+        clearNodeGroups()
 
         self.scene = scn
         self.errorPath = scn.DazErrorPath
@@ -137,6 +150,9 @@ class Settings:
         self.propMax = scn.DazPropMax
         self.useDazPropLimits = scn.DazUsePropLimits
         self.useDazPropDefault = scn.DazUsePropDefault
+        self.pruneMorphs = scn.DazPruneMorphs
+        self.morphEpsilon = scn.DazMorphEpsilon
+        self.bakeConstantMorphs = scn.DazBakeConstantMorphs
         self.autoMaterials = scn.DazAutoMaterials
         self.handleOpaque = scn.DazHandleOpaque
         self.handleRefractive = scn.DazHandleRefractive
@@ -154,6 +170,8 @@ class Settings:
         self.useTextures = scn.DazUseTextures
         self.useEmission = scn.DazUseEmission
         self.useReflection = scn.DazUseReflection
+        self.reuseMaterials = scn.DazReuseMaterials
+        self.deferImages = scn.DazDeferImages
 
 
     def forImport(self, btn, scn):
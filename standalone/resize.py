@@ -1,44 +1,126 @@
 import cv2
 import os
+import sys
+import time
 import argparse
+from multiprocessing import Pool, cpu_count
+
+
+def getBaseFile(file):
+    fname,ext = os.path.splitext(file)
+    if fname[-5:-1] == "-res" and fname[-1].isdigit():
+        fname = fname[:-5]
+    return fname + ext
+
+
+def getNewFile(file, steps):
+    fname,ext = os.path.splitext(file)
+    return "%s-res%d%s" % (fname, steps, ext)
+
+
+def isUpToDate(file, newfile):
+    return (os.path.isfile(newfile) and
+            os.path.getmtime(newfile) >= os.path.getmtime(file))
+
+
+def resizeFile(job):
+    # Decode the source once and write every requested tier.
+    file,tiers,overwrite = job
+    if not overwrite:
+        file = getBaseFile(file)
+    if not os.path.isfile(file):
+        return file, 0, 0, "The file %s does not exist" % file
+
+    todo = []
+    for steps in tiers:
+        if overwrite:
+            newfile = file
+        else:
+            newfile = getNewFile(file, steps)
+            if isUpToDate(file, newfile):
+                continue
+        todo.append((steps, newfile))
+    if not todo:
+        return file, 0, 0, "%s is up to date" % os.path.basename(file)
+
+    img = cv2.imread(file, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return file, 0, 0, "Cannot read %s" % file
+    rows,cols = img.shape[0:2]
+    msgs = []
+    for steps,newfile in todo:
+        factor = 0.5**steps
+        newrows = max(4, int(factor*rows))
+        newcols = max(4, int(factor*cols))
+        newimg = cv2.resize(img, (newcols,newrows), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(newfile, newimg)
+        msgs.append("%s: (%d, %d) => (%d %d)" % (os.path.basename(newfile), rows, cols, newrows, newcols))
+    return file, len(todo), rows*cols, "\n".join(msgs)
+
+
+def getFiles(args):
+    files = list(args.files)
+    if args.list:
+        with open(args.list, "r", encoding="utf-8") as fp:
+            files += [line.strip() for line in fp if line.strip()]
+    return files
+
+
+def getTiers(args, files):
+    # Old style call: resize.py file steps [-o]
+    if args.steps is None:
+        if len(files) > 1 and files[-1].isdigit():
+            return [int(files.pop())]
+        print("No steps given")
+        return []
+    return args.steps
+
 
 def main():
-    parser = argparse.ArgumentParser(description="")
-    parser.add_argument("file", type=str, help="Name of input file.")
-    parser.add_argument("steps", type=int, help="Number of steps")
+    parser = argparse.ArgumentParser(description="Resize images by powers of two.")
+    parser.add_argument("files", type=str, nargs="*", help="Names of input files.")
+    parser.add_argument("--steps", "-s", dest="steps", type=int, nargs="+", help="Number of steps for each tier")
+    parser.add_argument("--list", "-l", dest="list", type=str, help="Text file with one input file per line")
+    parser.add_argument("--jobs", "-j", dest="jobs", type=int, default=0, help="Number of processes")
     parser.add_argument("--overwrite", "-o", dest="overwrite", action="store_true")
     args = parser.parse_args()
 
-    if args.steps == 0:
+    files = getFiles(args)
+    tiers = getTiers(args, files)
+    tiers = [steps for steps in tiers if steps != 0]
+    if not tiers or not files:
         return
-    if args.steps < 0 or args.steps > 8:
-        print("Steps must be an integer between 1 and 8")
+    for steps in tiers:
+        if steps < 0 or steps > 8:
+            print("Steps must be an integer between 1 and 8")
+            return
+    if args.overwrite and len(tiers) > 1:
+        print("Only one tier can overwrite the original files")
         return
-    else:
-        factor = 0.5**args.steps
 
-    if args.overwrite:
-        newfile = args.file
+    t1 = time.time()
+    jobs = [(file, tiers, args.overwrite) for file in files]
+    nprocs = args.jobs if args.jobs > 0 else cpu_count()
+    nprocs = max(1, min(nprocs, len(jobs)))
+    nfiles = npixels = 0
+    if nprocs == 1:
+        results = map(resizeFile, jobs)
     else:
-        fname,ext = os.path.splitext(args.file)
-        if fname[-5:-1] == "-res" and fname[-1].isdigit():
-            fname = fname[:-5]
-            args.file = fname + ext
-        newfile = "%s-res%d%s" % (fname, args.steps, ext)
-
-    if not os.path.isfile(args.file):
-        print("The file %s does not exist" % args.file)
-        return
-    if os.path.isfile(newfile) and not args.overwrite:
-        print("%s already exists" % os.path.basename(newfile))
-        return
+        pool = Pool(nprocs)
+        results = pool.imap_unordered(resizeFile, jobs)
+    for file,nwritten,pixels,msg in results:
+        print(msg)
+        if nwritten:
+            nfiles += 1
+            npixels += pixels
+    if nprocs > 1:
+        pool.close()
+        pool.join()
+    t2 = time.time()
+    if nfiles and t2 > t1:
+        print("Resized %d images (%.1f Mpixels) in %.2f seconds, %.2f images/s, %d processes" %
+              (nfiles, npixels*1e-6, t2-t1, nfiles/(t2-t1), nprocs))
 
-    img = cv2.imread(args.file, cv2.IMREAD_UNCHANGED)
-    rows,cols = img.shape[0:2]
-    newrows = max(4, int(factor*rows))
-    newcols = max(4, int(factor*cols))
-    newimg = cv2.resize(img, (newcols,newrows), interpolation=cv2.INTER_AREA)
-    print("%s: (%d, %d) => (%d %d)" % (os.path.basename(newfile), rows, cols, newrows, newcols))
-    cv2.imwrite(os.path.join(args.file, newfile), newimg)
 
-main()
+if __name__ == "__main__":
+    main()
@@ -78,7 +78,7 @@ class MorphTransferer(DazImageFile, SingleFile, TransferOptions):
 
 
     def transferMorphs(self, hum, clo, context):
-        from .driver import getShapekeyBoneDriver, getShapekeyPropDriver, copyDriver
+        from .driver import DriverIndex, snapshotDriver, restoreDrivers
         from .asset import setDazPaths
 
         print("Transfer morphs %s => %s" %(hum.name, clo.name))
@@ -90,6 +90,8 @@ class MorphTransferer(DazImageFile, SingleFile, TransferOptions):
         else:
             basic = None
         hskeys = hum.data.shape_keys
+        index = DriverIndex(hskeys)
+        snapshot = []
         if hum.active_shape_key_index < 0:
             hum.active_shape_key_index = 0
         clo.active_shape_key_index = 0
@@ -112,9 +114,9 @@ class MorphTransferer(DazImageFile, SingleFile, TransferOptions):
 
             if self.useDriver:
                 if self.useBoneDriver:
-                    fcu = getShapekeyBoneDriver(hskeys, sname)
+                    fcu = index.getShapekeyDriver(sname, 'TRANSFORMS')
                 elif self.usePropDriver:
-                    fcu = getShapekeyPropDriver(hskeys, sname)
+                    fcu = index.getShapekeyDriver(sname, 'SINGLE_PROP')
                 #if (fcu is None and
                 #    (self.useCorrectives or self.useExpressions)):
                 #    continue
@@ -156,10 +158,13 @@ class MorphTransferer(DazImageFile, SingleFile, TransferOptions):
                 cskey.slider_max = hskey.slider_max
                 cskey.value = hskey.value
                 if fcu is not None:
-                    copyDriver(fcu, cskey)
+                    snapshot.append(snapshotDriver(fcu))
             else:
                 print(" -", sname)
 
+        if snapshot:
+            restoreDrivers(clo.data.shape_keys, snapshot)
+
         if (basic and
             len(clo.data.shape_keys.key_blocks) == 1 and
             clo.data.shape_keys.key_blocks[0] == basic):
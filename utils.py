@@ -366,6 +366,80 @@ def hasPoseBones(rig, bnames):
             return False
     return True
 
+#-------------------------------------------------------------
+#   Collection index cache.
+#   Maps lookup keys to item indices in collection properties,
+#   e.g. DazFormulas or pose bone prop groups, so that lookups
+#   do not scan the collection. An index is rebuilt when the
+#   collection length or the global version changes, and when a
+#   hit points to another item. Misses are trusted, since addItem
+#   and removeItem keep the index current. The version is bumped
+#   when a file is loaded.
+#-------------------------------------------------------------
+
+theIndexVersion = 0
+theIndexCache = {}
+
+def clearCollectionIndices():
+    global theIndexVersion, theIndexCache
+    theIndexVersion += 1
+    theIndexCache = {}
+
+
+def getCollectionIndex(coll, getKey, rebuild=False):
+    ckey = (coll.id_data.as_pointer(), coll.path_from_id())
+    entry = theIndexCache.get(ckey)
+    if (rebuild or
+        entry is None or
+        entry[0] != theIndexVersion or
+        entry[1] != len(coll)):
+        index = {}
+        for n,item in enumerate(coll):
+            key = getKey(item)
+            if key not in index.keys():
+                index[key] = n
+        entry = theIndexCache[ckey] = [theIndexVersion, len(coll), index]
+    return entry
+
+
+def findItem(coll, key, getKey):
+    n = findItemIndex(coll, key, getKey)
+    if n is None:
+        return None
+    return coll[n]
+
+
+def findItemIndex(coll, key, getKey):
+    entry = getCollectionIndex(coll, getKey)
+    n = entry[2].get(key)
+    if n is not None and getKey(coll[n]) != key:
+        entry = getCollectionIndex(coll, getKey, True)
+        n = entry[2].get(key)
+    return n
+
+
+def addItem(coll, key, getKey):
+    entry = getCollectionIndex(coll, getKey)
+    item = coll.add()
+    entry[1] = len(coll)
+    entry[2][key] = len(coll)-1
+    return item
+
+
+def removeItem(coll, key, getKey):
+    n = findItemIndex(coll, key, getKey)
+    if n is None:
+        return False
+    entry = getCollectionIndex(coll, getKey)
+    coll.remove(n)
+    index = entry[2]
+    del index[key]
+    for key1,n1 in index.items():
+        if n1 > n:
+            index[key1] = n1-1
+    entry[1] = len(coll)
+    return True
+
 #-------------------------------------------------------------
 #   Coords
 #-------------------------------------------------------------
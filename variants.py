@@ -0,0 +1,248 @@
+# Copyright (c) 2016-2019, Thomas Larsson
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+import bpy
+from .error import *
+from .utils import *
+if bpy.app.version < (2,80,0):
+    from .buttons27 import JsonFile, SingleFile, VariantOptions
+else:
+    from .buttons28 import JsonFile, SingleFile, VariantOptions
+
+#-------------------------------------------------------------
+#   Sparse morph set.
+#   Each morph stores the vertex indices and offsets of its nonzero
+#   deltas. Variants are evaluated one morph at a time, so memory
+#   grows with the largest morph rather than with all deltas.
+#-------------------------------------------------------------
+
+class MorphSet:
+
+    def __init__(self, nverts):
+        self.nverts = nverts
+        self.names = []
+        self.vnums = []
+        self.offsets = []
+
+
+    def __repr__(self):
+        return ("<MorphSet %d %d>" % (self.nverts, len(self.names)))
+
+
+    def addMorph(self, name, vnums, offsets):
+        import numpy as np
+        vnums = np.asarray(vnums, dtype=np.int32)
+        offsets = np.asarray(offsets, dtype=np.float32).reshape((-1,3))
+        uvnums,inverse = np.unique(vnums, return_inverse=True)
+        if len(uvnums) < len(vnums):
+            uoffsets = np.zeros((len(uvnums),3), dtype=np.float32)
+            np.add.at(uoffsets, inverse, offsets)
+            vnums,offsets = uvnums,uoffsets
+        self.names.append(name)
+        self.vnums.append(vnums)
+        self.offsets.append(offsets)
+
+
+    def addShapekeys(self, ob, eps=0.0):
+        import numpy as np
+        if ob.data.shape_keys is None:
+            return
+        nverts = len(ob.data.vertices)
+        skeys = ob.data.shape_keys.key_blocks
+        base = np.empty(3*nverts, dtype=np.float32)
+        skeys[0].data.foreach_get("co", base)
+        base = base.reshape((nverts,3))
+        coords = np.empty((nverts,3), dtype=np.float32)
+        for skey in skeys[1:]:
+            skey.data.foreach_get("co", coords.ravel())
+            offsets = coords - base
+            vnums = np.nonzero(np.abs(offsets).max(axis=1) > eps)[0]
+            self.addMorph(skey.name, vnums, offsets[vnums])
+
+
+    def getWeights(self, values):
+        import numpy as np
+        weights = np.zeros(len(self.names), dtype=np.float32)
+        if isinstance(values, dict):
+            index = dict([(name,n) for n,name in enumerate(self.names)])
+            for name,value in values.items():
+                if name in index.keys():
+                    weights[index[name]] = value
+                elif theSettings.verbosity > 1:
+                    print("Missing morph:", name)
+        elif len(values) != len(self.names):
+            raise DazError("Expected %d morph values but got %d" % (len(self.names), len(values)))
+        else:
+            weights[:] = values
+        return weights
+
+
+    def evaluate(self, base, weights, budget=1<<22):
+        # The variant chunk is capped so that the temporary array of
+        # the largest morph has at most budget elements.
+        import numpy as np
+        base = np.asarray(base, dtype=np.float32).reshape((self.nverts,3))
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float32))
+        nvars = weights.shape[0]
+        result = np.empty((nvars,self.nverts,3), dtype=np.float32)
+        result[:] = base
+        if not self.names:
+            return result
+        nmax = max([len(vnums) for vnums in self.vnums])
+        chunk = max(1, budget//max(1, 3*nmax))
+        for first in range(0, nvars, chunk):
+            res = result[first:first+chunk]
+            w = weights[first:first+chunk]
+            for k,(vnums,offsets) in enumerate(zip(self.vnums, self.offsets)):
+                wk = w[:,k]
+                if len(vnums) == 0 or not wk.any():
+                    continue
+                res[:,vnums] += wk[:,None,None]*offsets[None,:,:]
+        return result
+
+
+def getMorphSet(ob, eps=0.0):
+    mset = MorphSet(len(ob.data.vertices))
+    mset.addShapekeys(ob, eps)
+    return mset
+
+
+def getBaseCoords(ob):
+    import numpy as np
+    nverts = len(ob.data.vertices)
+    base = np.empty(3*nverts, dtype=np.float32)
+    if ob.data.shape_keys:
+        ob.data.shape_keys.key_blocks[0].data.foreach_get("co", base)
+    else:
+        ob.data.vertices.foreach_get("co", base)
+    return base.reshape((nverts,3))
+
+#-------------------------------------------------------------
+#   Generate variants from slider settings
+#-------------------------------------------------------------
+
+def getVariants(struct):
+    if isinstance(struct, dict) and "variants" in struct.keys():
+        struct = struct["variants"]
+    if isinstance(struct, dict):
+        return list(struct.items())
+    variants = []
+    for n,vstruct in enumerate(struct):
+        if "morphs" in vstruct.keys():
+            name = vstruct["name"] if "name" in vstruct.keys() else "Variant%d" % (n+1)
+            variants.append((name, vstruct["morphs"]))
+        else:
+            variants.append(("Variant%d" % (n+1), vstruct))
+    return variants
+
+
+class DAZ_OT_GenerateVariants(bpy.types.Operator, JsonFile, SingleFile, VariantOptions):
+    bl_idname = "daz.generate_variants"
+    bl_label = "Generate Variants"
+    bl_description = "Combine shapekeys with slider values from a json file into new meshes or shapekeys"
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(self, context):
+        ob = context.object
+        return (ob and ob.type == 'MESH' and ob.data.shape_keys)
+
+    def draw(self, context):
+        self.layout.prop(self, "useNewObjects")
+
+    def execute(self, context):
+        try:
+            self.generateVariants(context)
+        except DazError:
+            handleDazError(context)
+        return{'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+
+    def generateVariants(self, context):
+        import time
+        from .load_json import loadJson
+        ob = context.object
+        struct = loadJson(self.filepath)
+        if not struct:
+            raise DazError("No variants found in\n%s" % self.filepath)
+        variants = getVariants(struct)
+
+        t1 = time.clock()
+        mset = getMorphSet(ob)
+        weights = [mset.getWeights(values) for name,values in variants]
+        coords = mset.evaluate(getBaseCoords(ob), weights)
+        t2 = time.clock()
+        print("%d variants evaluated in %.3f seconds" % (len(variants), t2-t1))
+
+        for n,(name,values) in enumerate(variants):
+            if self.useNewObjects:
+                self.makeMesh(context, ob, name, coords[n])
+            else:
+                self.makeShapekey(ob, name, coords[n])
+
+
+    def makeMesh(self, context, ob, name, coords):
+        me = ob.data.copy()
+        me.name = name
+        nob = bpy.data.objects.new(name, me)
+        nob.parent = ob.parent
+        nob.matrix_parent_inverse = ob.matrix_parent_inverse.copy()
+        nob.matrix_basis = ob.matrix_basis.copy()
+        nob.shape_key_clear()
+        me.vertices.foreach_set("co", coords.ravel())
+        me.update()
+        getCollection(context).objects.link(nob)
+
+
+    def makeShapekey(self, ob, name, coords):
+        skeys = ob.data.shape_keys.key_blocks
+        if name in skeys.keys():
+            ob.shape_key_remove(skeys[name])
+        skey = ob.shape_key_add(name=name)
+        skey.value = 0.0
+        skey.data.foreach_set("co", coords.ravel())
+
+#----------------------------------------------------------
+#   Initialize
+#----------------------------------------------------------
+
+classes = [
+    DAZ_OT_GenerateVariants,
+]
+
+def initialize():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+
+def uninitialize():
+    for cls in classes:
+        bpy.utils.unregister_class(cls)